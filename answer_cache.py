@@ -0,0 +1,92 @@
+import time
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# ------------------ Overview ------------------ #
+# This module caches agent answers by meaning rather than exact text. Each entry stores the
+# normalized prompt embedding, the prompt type and the data version the answer was computed
+# on. A lookup returns the most similar entry above a cosine threshold for the current data
+# version; entries from older versions are dropped as soon as a newer version is seen, so
+# ingesting new games invalidates the cache automatically. Size is bounded with LRU eviction.
+# Plot files stored with an entry belong to the cache and are deleted when the entry goes.
+
+
+class SemanticAnswerCache:
+    def __init__(self, max_size: int = 256, similarity_threshold: float = 0.95):
+        self.max_size = max_size
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_key = 0
+        self._data_version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    @staticmethod
+    def _discard(entry: Dict[str, Any]):
+        """Delete the plot file owned by an entry that is leaving the cache"""
+        if entry.get("plot"):
+            Path(entry["plot"]).unlink(missing_ok=True)
+
+    def _sync_version(self, data_version: int):
+        """Drop every entry computed on an older version of the data"""
+        if data_version != self._data_version:
+            if self._entries:
+                print(f"🧹 Cleared {len(self._entries)} cached answers (data version {data_version})")
+            for entry in self._entries.values():
+                self._discard(entry)
+            self._entries.clear()
+            self._data_version = data_version
+
+    def get(self, embedding: List[float], data_version: int,
+            prompt_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the closest cached entry above the threshold (any prompt type when None)"""
+        self._sync_version(data_version)
+        query = self._normalize(embedding)
+        best_key, best_score = None, self.similarity_threshold
+        for key, entry in self._entries.items():
+            if prompt_type is not None and entry["prompt_type"] != prompt_type:
+                continue
+            score = float(entry["embedding"] @ query)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(best_key)
+        return {**self._entries[best_key], "similarity": best_score}
+
+    def put(self, prompt: str, embedding: List[float], prompt_type: str, data_version: int,
+            answer: str, plot: Optional[str] = None):
+        """Store an answer (and its plot path) for the given data version"""
+        self._sync_version(data_version)
+        self._entries[self._next_key] = {
+            "prompt": prompt,
+            "embedding": self._normalize(embedding),
+            "prompt_type": prompt_type,
+            "answer": answer,
+            "plot": plot,
+            "created_at": time.time()
+        }
+        self._next_key += 1
+        while len(self._entries) > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            self._discard(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "data_version": self._data_version
+        }
@@ -0,0 +1,73 @@
+import time
+import numpy as np
+from embedding_store import EmbeddingStore
+from numpy_index import NumpyVectorIndex
+
+# ------------------ Overview ------------------ #
+# This script reports recall versus latency and memory for the compressed first-pass modes
+# of NumpyVectorIndex (Matryoshka truncation and float16/int8 quantization with exact re-rank).
+# Queries are stored chunk embeddings with a little noise added, and recall@k is measured
+# against the exact full-precision top-k. Cosine space is used throughout: text-embedding-3
+# vectors are unit length, so this ranks identically to Chroma's default l2 space.
+
+# ------------------ Config ------------------ #
+EMBEDDED_DIR = "unstructured/embedded"
+TOP_N = 5
+NUM_QUERIES = 200
+QUERY_NOISE = 0.05
+CONFIGS = [
+    {"first_pass_dims": None, "quantization": None},
+    {"first_pass_dims": None, "quantization": "float16"},
+    {"first_pass_dims": None, "quantization": "int8"},
+    {"first_pass_dims": 1024, "quantization": None},
+    {"first_pass_dims": 512, "quantization": "float16"},
+    {"first_pass_dims": 256, "quantization": "int8"},
+]
+
+
+def make_queries(index: NumpyVectorIndex, num_queries: int, noise: float, seed: int = 0) -> np.ndarray:
+    """Sample stored vectors and perturb them to stand in for paraphrased user questions"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=min(num_queries, len(index)), replace=False)
+    queries = index._unit_rows(np.sort(rows))
+    queries = queries + rng.normal(scale=noise / np.sqrt(queries.shape[1]), size=queries.shape)
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def evaluate(index: NumpyVectorIndex, queries: np.ndarray, truth: list, top_n: int) -> dict:
+    """Measure recall@top_n against the exact results, plus mean latency per query"""
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        found = {result["metadata"].get("id") for result in index.search(query, top_n)}
+        hits += len(found & expected)
+    elapsed = time.perf_counter() - start
+    return {
+        "recall": hits / max(1, sum(len(expected) for expected in truth)),
+        "latency_ms": 1000 * elapsed / max(1, len(queries))
+    }
+
+
+def main():
+    store = EmbeddingStore(EMBEDDED_DIR)
+    if not store.exists():
+        print(f"❌ No embedding store found in {EMBEDDED_DIR} - run embed.py first.")
+        return
+
+    exact = NumpyVectorIndex.from_store(store, space="cosine")
+    queries = make_queries(exact, NUM_QUERIES, QUERY_NOISE)
+    truth = [{result["metadata"].get("id") for result in exact.search(query, TOP_N)} for query in queries]
+    print(f"📊 {len(exact)} vectors x {exact.unit_vectors.shape[1]} dims, {len(queries)} queries, recall@{TOP_N}")
+    print(f"{'dims':>6} {'quant':>8} {'recall':>8} {'ms/query':>9} {'first-pass MB':>14}")
+
+    for config in CONFIGS:
+        index = NumpyVectorIndex.from_store(store, space="cosine", **config)
+        result = evaluate(index, queries, truth, TOP_N)
+        memory = index.memory_bytes()
+        first_pass_mb = (memory["first_pass"] or memory["full"]) / 1e6
+        print(f"{str(config['first_pass_dims'] or 'full'):>6} {str(config['quantization'] or 'f32'):>8} "
+              f"{result['recall']:>8.3f} {result['latency_ms']:>9.3f} {first_pass_mb:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from create_sqlite_db import YakkerTechDB
+
+# ------------------ Overview ------------------ #
+# This script compares full-table scans against index seeks on the yakkertech table.
+# It copies the database to a temp directory, replicates the pitches SCALE times (shifting
+# PitchNo so the unique key still holds), migrates the copy, and times each lookup both with
+# "NOT INDEXED" (forced scan) and normally, printing SQLite's query plan for the indexed run.
+
+# ------------------ Config ------------------ #
+DB_PATH = "structured/sqllite_db.db"
+SCALE = 100
+REPEATS = 20
+QUERIES = {
+    "pitcher pitch mix": ("SELECT TaggedPitchType, COUNT(*), AVG(RelSpeed), AVG(SpinRate) FROM yakkertech {hint} "
+                          "WHERE Pitcher = (SELECT Pitcher FROM yakkertech LIMIT 1) GROUP BY TaggedPitchType"),
+    "batter exit velo": ("SELECT AVG(ExitSpeed) FROM yakkertech {hint} "
+                         "WHERE Batter = (SELECT Batter FROM yakkertech LIMIT 1) AND PitchCall = 'InPlay'"),
+    "one game": "SELECT COUNT(*) FROM yakkertech {hint} WHERE GameID = (SELECT GameID FROM yakkertech LIMIT 1)",
+    "one date": "SELECT COUNT(*) FROM yakkertech {hint} WHERE Date = (SELECT Date FROM yakkertech LIMIT 1)",
+    "pitch by uuid": "SELECT * FROM yakkertech {hint} WHERE PitchUUID = (SELECT PitchUUID FROM yakkertech LIMIT 1)",
+}
+
+
+def replicate(connection: sqlite3.Connection, scale: int):
+    """Append scale-1 shifted copies of every pitch"""
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(yakkertech)")]
+    select = ", ".join(f'"PitchNo" + {{offset}}' if column == "PitchNo" else f'"{column}"' for column in columns)
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    base = connection.execute("SELECT MAX(rowid) FROM yakkertech").fetchone()[0]
+    offset_step = connection.execute("SELECT MAX(PitchNo) + 1 FROM yakkertech").fetchone()[0]
+    for copy in range(1, scale):
+        connection.execute(
+            f"INSERT INTO yakkertech ({quoted}) SELECT {select.format(offset=copy * offset_step)} "
+            f"FROM yakkertech WHERE rowid <= ?", (base,)
+        )
+    connection.commit()
+
+
+def time_query(connection: sqlite3.Connection, sql: str, repeats: int) -> float:
+    """Mean milliseconds per execution"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        connection.execute(sql).fetchall()
+    return 1000 * (time.perf_counter() - start) / repeats
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = Path(tmp) / "bench.db"
+        shutil.copy(DB_PATH, db_copy)
+
+        db = YakkerTechDB(str(db_copy))
+        db.connect()
+        db.migrate()
+        replicate(db.connection, SCALE)
+        db.cursor.execute("ANALYZE yakkertech")
+        rows = db.cursor.execute("SELECT COUNT(*) FROM yakkertech").fetchone()[0]
+
+        print(f"📊 {rows} rows ({SCALE}x), mean of {REPEATS} runs")
+        print(f"{'query':<20} {'scan ms':>9} {'seek ms':>9} {'speedup':>8}  plan")
+        for label, template in QUERIES.items():
+            scan = time_query(db.connection, template.format(hint="NOT INDEXED"), REPEATS)
+            seek = time_query(db.connection, template.format(hint=""), REPEATS)
+            plan = db.cursor.execute("EXPLAIN QUERY PLAN " + template.format(hint="")).fetchall()
+            detail = "; ".join(step[-1] for step in plan if "SCAN" in step[-1] or "SEARCH" in step[-1])
+            print(f"{label:<20} {scan:>9.2f} {seek:>9.2f} {scan / max(seek, 1e-9):>7.1f}x  {detail}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
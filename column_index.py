@@ -0,0 +1,137 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from create_sqlite_db import YAKKERTECH_COLUMNS
+
+# ------------------ Overview ------------------ #
+# This module provides an exact-match lexical index over the yakkertech columns.
+# It resolves explicit column mentions in a prompt ("SpinRate", "spinrate", "spin rate",
+# "column AF") without an embedding call. Keys come from the table schema; descriptions
+# come from the data dictionary, joined on the spreadsheet column letter (schema order
+# matches the CSV export, so column 0 is "A", column 26 is "AA", and so on).
+
+COLUMN_LETTER_PATTERN = re.compile(r"\b[Cc]olumns?\s+([A-Z]{1,2})\b")
+# Letters that are also words ("columns I need", "column A or B") are not treated as letters
+WORD_LETTERS = {"A", "I"}
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_/]+")
+MAX_PHRASE_WORDS = 5
+# Two-word phrases ("pitch no", "spin rate") read like ordinary English; longer ones are specific
+MIN_CONFIDENT_PHRASE_WORDS = 3
+
+
+def column_letter(index: int) -> str:
+    """Convert a zero-based column index to its spreadsheet letter (0 -> A, 26 -> AA)"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def letter_index(letter: str) -> int:
+    """Convert a spreadsheet letter back to a zero-based column index"""
+    index = 0
+    for char in letter.strip().upper():
+        index = index * 26 + (ord(char) - ord("A") + 1)
+    return index - 1
+
+
+def split_identifier(name: str) -> List[str]:
+    """Split a column name into lowercase words: yt_InducedVertBreak -> [yt, induced, vert, break]"""
+    words = []
+    for part in re.split(r"[_/\s]+", name):
+        words.extend(re.findall(r"[A-Z]+(?=[A-Z][a-z]|\d|\b)|[A-Z]?[a-z]+|[A-Z]+|\d+", part))
+    return [word.lower() for word in words if word]
+
+
+class ColumnIndex:
+    def __init__(self, columns: Optional[List[str]] = None,
+                 descriptions: Optional[Dict[str, str]] = None):
+        self.columns = columns or [name for name, _ in YAKKERTECH_COLUMNS]
+        self.descriptions = descriptions or {}
+        self.letters = {column_letter(i): name for i, name in enumerate(self.columns)}
+        self.exact: Dict[str, str] = {}
+        self.folded: Dict[str, str] = {}
+        self.phrases: Dict[str, str] = {}
+        for name in self.columns:
+            self.exact[name] = name
+            self.folded.setdefault(name.casefold(), name)
+            words = split_identifier(name)
+            if len(words) > 1:
+                self.phrases.setdefault(" ".join(words), name)
+
+    @staticmethod
+    def _expand_letters(letters: str) -> List[str]:
+        """Expand a data dictionary letter reference such as "AY-BA" into individual letters"""
+        if "-" not in letters:
+            return [letters.strip()]
+        start, end = letters.split("-", 1)
+        return [column_letter(i) for i in range(letter_index(start), letter_index(end) + 1)]
+
+    @classmethod
+    def from_data_dictionary(cls, documents: List[str], metadatas: List[Dict[str, Any]]) -> "ColumnIndex":
+        """Build the index from data dictionary chunks, attaching each description by column letter"""
+        index = cls()
+        for document, metadata in zip(documents, metadatas):
+            for letter in cls._expand_letters((metadata or {}).get("column_letter") or ""):
+                name = index.letters.get(letter)
+                if name:
+                    index.descriptions.setdefault(name, document)
+        return index
+
+    @classmethod
+    def from_collection(cls, collection: Any) -> "ColumnIndex":
+        """Build the index from the data_dictionary Chroma collection (a local read, no embedding)"""
+        data = collection.get(include=["documents", "metadatas"])
+        return cls.from_data_dictionary(data["documents"], data["metadatas"])
+
+    def _find(self, prompt: str) -> List[Tuple[int, str, bool]]:
+        """All column mentions as (position, column, confident) tuples"""
+        found: List[Tuple[int, str, bool]] = []
+
+        for match in TOKEN_PATTERN.finditer(prompt):
+            token = match.group(0)
+            name = self.exact.get(token)
+            if name:
+                # "SpinRate" is unambiguous; "Pitcher" or "Date" are also ordinary words
+                found.append((match.start(), name, len(split_identifier(name)) > 1))
+            elif self.folded.get(token.casefold()):
+                found.append((match.start(), self.folded[token.casefold()], False))
+
+        words = [(m.start(), m.group(0).lower()) for m in re.finditer(r"[A-Za-z]+|\d+", prompt)]
+        for size in range(2, MAX_PHRASE_WORDS + 1):
+            for i in range(len(words) - size + 1):
+                name = self.phrases.get(" ".join(word for _, word in words[i:i + size]))
+                if name:
+                    found.append((words[i][0], name, size >= MIN_CONFIDENT_PHRASE_WORDS))
+
+        for match in COLUMN_LETTER_PATTERN.finditer(prompt):
+            name = self.letters.get(match.group(1))
+            if name and match.group(1) not in WORD_LETTERS:
+                found.append((match.start(), name, True))
+        return found
+
+    def match(self, prompt: str, confident_only: bool = False) -> List[str]:
+        """
+        Return the columns mentioned in the prompt, in order of first mention. With
+        confident_only, case-folded single words ("pitcher", "date") and two-word phrases
+        ("pitch no") are left out: they are often ordinary English, so callers should still
+        consult the vector search for them.
+        """
+        ordered = []
+        for _, name, confident in sorted(self._find(prompt), key=lambda item: item[0]):
+            if (confident or not confident_only) and name not in ordered:
+                ordered.append(name)
+        return ordered
+
+    def describe(self, columns: List[str]) -> str:
+        """Format descriptions for the given columns, one per line, without repeats"""
+        lines = []
+        for name in columns:
+            line = self.descriptions.get(name) or name
+            if name not in line:
+                # Range entries such as "PositionAt110X,Y,Z" don't spell out every column
+                line = f"{name}: {line}"
+            if line not in lines:
+                lines.append(line)
+        return "\n".join(lines)
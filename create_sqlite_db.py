@@ -1,10 +1,191 @@
+import sys
 import sqlite3
 from pathlib import Path
+from pitch_snapshot import PitchSnapshot, bump_table_generation
+from pitch_aggregates import PitchAggregates
 
 
 # ------------------ Overview ------------------ #
 # This script creates a SQLite database and table for storing softball data.
 # It provides functionality to connect to the database, create the table, and close the connection.
+# The table has a unique pitch key plus secondary indexes for the common filter columns;
+# `python create_sqlite_db.py migrate` adds them to an existing database without dropping data.
+
+# ------------------ Schema ------------------ #
+# Column name and SQLite type for every field in a Yakkertech CSV export, in file order.
+YAKKERTECH_COLUMNS = [
+    ("PitchNo", "INTEGER"),
+    ("Date", "TEXT"),
+    ("Time", "TEXT"),
+    ("PAofInning", "INTEGER"),
+    ("PitchofPA", "INTEGER"),
+    ("Pitcher", "TEXT"),
+    ("PitcherId", "TEXT"),
+    ("PitcherThrows", "TEXT"),
+    ("PitcherTeam", "TEXT"),
+    ("Batter", "TEXT"),
+    ("BatterId", "TEXT"),
+    ("BatterSide", "TEXT"),
+    ("BatterTeam", "TEXT"),
+    ("PitcherSet", "FLOAT"),
+    ("Inning", "INTEGER"),
+    ("Top/Bottom", "TEXT"),
+    ("Outs", "INTEGER"),
+    ("Balls", "INTEGER"),
+    ("Strikes", "INTEGER"),
+    ("TaggedPitchType", "TEXT"),
+    ("AutoPitchType", "FLOAT"),
+    ("PitchCall", "TEXT"),
+    ("KorBB", "TEXT"),
+    ("HitType", "TEXT"),
+    ("PlayResult", "TEXT"),
+    ("OutsOnPlay", "FLOAT"),
+    ("RunsScored", "FLOAT"),
+    ("Notes", "FLOAT"),
+    ("RelSpeed", "FLOAT"),
+    ("VertRelAngle", "FLOAT"),
+    ("HorzRelAngle", "FLOAT"),
+    ("SpinRate", "FLOAT"),
+    ("SpinAxis", "FLOAT"),
+    ("Tilt", "TEXT"),
+    ("RelHeight", "FLOAT"),
+    ("RelSide", "FLOAT"),
+    ("Extension", "FLOAT"),
+    ("VertBreak", "FLOAT"),
+    ("InducedVertBreak", "FLOAT"),
+    ("HorzBreak", "FLOAT"),
+    ("PlateLocHeight", "FLOAT"),
+    ("PlateLocSide", "FLOAT"),
+    ("ZoneSpeed", "FLOAT"),
+    ("VertApprAngle", "FLOAT"),
+    ("HorzApprAngle", "FLOAT"),
+    ("ZoneTime", "FLOAT"),
+    ("ExitSpeed", "FLOAT"),
+    ("Angle", "FLOAT"),
+    ("Direction", "FLOAT"),
+    ("HitSpinRate", "FLOAT"),
+    ("PositionAt110X", "FLOAT"),
+    ("PositionAt110Y", "FLOAT"),
+    ("PositionAt110Z", "FLOAT"),
+    ("Distance", "FLOAT"),
+    ("LastTrackedDistance", "FLOAT"),
+    ("Bearing", "FLOAT"),
+    ("HangTime", "FLOAT"),
+    ("pfxx", "FLOAT"),
+    ("pfxz", "FLOAT"),
+    ("x0", "FLOAT"),
+    ("y0", "FLOAT"),
+    ("z0", "FLOAT"),
+    ("vx0", "FLOAT"),
+    ("vy0", "FLOAT"),
+    ("vz0", "FLOAT"),
+    ("ax0", "FLOAT"),
+    ("ay0", "FLOAT"),
+    ("az0", "FLOAT"),
+    ("HomeTeam", "TEXT"),
+    ("AwayTeam", "TEXT"),
+    ("Stadium", "FLOAT"),
+    ("Level", "FLOAT"),
+    ("League", "FLOAT"),
+    ("GameID", "TEXT"),
+    ("PitchUUID", "TEXT"),
+    ("yt_RelSpeed", "FLOAT"),
+    ("yt_RelHeight", "FLOAT"),
+    ("yt_RelSide", "FLOAT"),
+    ("yt_VertRelAngle", "FLOAT"),
+    ("yt_HorzRelAngle", "FLOAT"),
+    ("yt_ZoneSpeed", "FLOAT"),
+    ("yt_PlateLocHeight", "FLOAT"),
+    ("yt_PlateLocSide", "FLOAT"),
+    ("yt_VertApprAngle", "FLOAT"),
+    ("yt_HorzApprAngle", "FLOAT"),
+    ("yt_ZoneTime", "FLOAT"),
+    ("yt_HorzBreak", "FLOAT"),
+    ("yt_InducedVertBreak", "FLOAT"),
+    ("yt_OutOfPlane", "FLOAT"),
+    ("yt_FSRI", "FLOAT"),
+    ("yt_EffectiveSpin", "FLOAT"),
+    ("yt_GyroSpin", "FLOAT"),
+    ("yt_Efficiency", "FLOAT"),
+    ("yt_SpinComponentX", "FLOAT"),
+    ("yt_SpinComponentY", "FLOAT"),
+    ("yt_SpinComponentZ", "FLOAT"),
+    ("yt_HitVelocityX", "FLOAT"),
+    ("yt_HitVelocityY", "FLOAT"),
+    ("yt_HitVelocityZ", "FLOAT"),
+    ("yt_HitLocationX", "FLOAT"),
+    ("yt_HitLocationY", "FLOAT"),
+    ("yt_HitLocationZ", "FLOAT"),
+    ("yt_GroundLocationX", "FLOAT"),
+    ("yt_GroundLocationY", "FLOAT"),
+    ("yt_HitBreakX", "FLOAT"),
+    ("yt_HitBreakY", "FLOAT"),
+    ("yt_HitBreakT", "FLOAT"),
+    ("yt_HitSpinComponentX", "FLOAT"),
+    ("yt_HitSpinComponentY", "FLOAT"),
+    ("yt_HitSpinComponentZ", "FLOAT"),
+    ("yt_SessionName", "FLOAT"),
+    ("Note", "FLOAT"),
+    ("yt_PitchSpinConfidence", "FLOAT"),
+    ("yt_PitchReleaseConfidence", "FLOAT"),
+    ("yt_HitSpinConfidence", "FLOAT"),
+    ("yt_EffectiveBattingSpeed", "FLOAT"),
+    ("yt_ReleaseAccuracy", "TEXT"),
+    ("yt_ZoneAccuracy", "TEXT"),
+    ("yt_SeamLat", "FLOAT"),
+    ("yt_SeamLong", "FLOAT"),
+    ("yt_ReleaseDistance", "FLOAT"),
+    ("Catcher", "TEXT"),
+    ("CatcherId", "FLOAT"),
+    ("CatcherTeam", "TEXT"),
+    ("yt_AeroModel", "TEXT")
+]
+
+# ------------------ Indexes ------------------ #
+# One row per pitch: the same PitchNo/Date/Time key YakkerTechDataLoader deduplicates on.
+# SQLite treats NULLs as distinct in a UNIQUE index, so the key is built on COALESCEd columns;
+# otherwise re-ingesting a row with a missing key part would insert it again.
+PITCH_KEY_COLUMNS = ["PitchNo", "Date", "Time"]
+PITCH_KEY_INDEX = "ux_yakkertech_pitch_key"
+# Secondary indexes; trailing columns make the common per-pitcher/per-batter rollups index-only
+YAKKERTECH_INDEXES = {
+    "idx_yakkertech_pitcher": ["Pitcher", "TaggedPitchType", "RelSpeed", "SpinRate"],
+    "idx_yakkertech_batter": ["Batter", "PitchCall", "ExitSpeed"],
+    "idx_yakkertech_game": ["GameID", "PitchNo"],
+    "idx_yakkertech_date": ["Date"],
+    "idx_yakkertech_uuid": ["PitchUUID"],
+}
+
+
+def _column_list(columns: list) -> str:
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def pitch_key_expression() -> str:
+    """Non-NULL pitch key used by the unique index and by duplicate removal"""
+    return ", ".join(f"""COALESCE("{column}", '')""" for column in PITCH_KEY_COLUMNS)
+
+
+def ensure_pitch_key_index(connection: sqlite3.Connection):
+    """
+    Create the unique pitch key, replacing an older index built on the raw (nullable) columns.
+    Raises sqlite3.IntegrityError, leaving any existing index in place, if rows are duplicated.
+    """
+    row = connection.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+                             (PITCH_KEY_INDEX,)).fetchone()
+    if row and "COALESCE" in row[0]:
+        return
+    if connection.in_transaction:
+        connection.commit()
+    try:
+        connection.execute("BEGIN")
+        connection.execute(f"DROP INDEX IF EXISTS {PITCH_KEY_INDEX}")
+        connection.execute(f"CREATE UNIQUE INDEX {PITCH_KEY_INDEX} ON yakkertech ({pitch_key_expression()})")
+        connection.commit()
+    except sqlite3.IntegrityError:
+        connection.rollback()
+        raise
+
 
 class YakkerTechDB:
     def __init__(self, db_path: str = "structured/sqllite_db.db"):
@@ -28,140 +209,60 @@ class YakkerTechDB:
 
         self.cursor.execute("DROP TABLE IF EXISTS yakkertech")
         
-        self.cursor.execute('''
-        CREATE TABLE yakkertech (
-            "PitchNo" INTEGER,
-            "Date" TEXT,
-            "Time" TEXT,
-            "PAofInning" INTEGER,
-            "PitchofPA" INTEGER,
-            "Pitcher" TEXT,
-            "PitcherId" TEXT,
-            "PitcherThrows" TEXT,
-            "PitcherTeam" TEXT,
-            "Batter" TEXT,
-            "BatterId" TEXT,
-            "BatterSide" TEXT,
-            "BatterTeam" TEXT,
-            "PitcherSet" FLOAT,
-            "Inning" INTEGER,
-            "Top/Bottom" TEXT,
-            "Outs" INTEGER,
-            "Balls" INTEGER,
-            "Strikes" INTEGER,
-            "TaggedPitchType" TEXT,
-            "AutoPitchType" FLOAT,
-            "PitchCall" TEXT,
-            "KorBB" TEXT,
-            "HitType" TEXT,
-            "PlayResult" TEXT,
-            "OutsOnPlay" FLOAT,
-            "RunsScored" FLOAT,
-            "Notes" FLOAT,
-            "RelSpeed" FLOAT,
-            "VertRelAngle" FLOAT,
-            "HorzRelAngle" FLOAT,
-            "SpinRate" FLOAT,
-            "SpinAxis" FLOAT,
-            "Tilt" TEXT,
-            "RelHeight" FLOAT,
-            "RelSide" FLOAT,
-            "Extension" FLOAT,
-            "VertBreak" FLOAT,
-            "InducedVertBreak" FLOAT,
-            "HorzBreak" FLOAT,
-            "PlateLocHeight" FLOAT,
-            "PlateLocSide" FLOAT,
-            "ZoneSpeed" FLOAT,
-            "VertApprAngle" FLOAT,
-            "HorzApprAngle" FLOAT,
-            "ZoneTime" FLOAT,
-            "ExitSpeed" FLOAT,
-            "Angle" FLOAT,
-            "Direction" FLOAT,
-            "HitSpinRate" FLOAT,
-            "PositionAt110X" FLOAT,
-            "PositionAt110Y" FLOAT,
-            "PositionAt110Z" FLOAT,
-            "Distance" FLOAT,
-            "LastTrackedDistance" FLOAT,
-            "Bearing" FLOAT,
-            "HangTime" FLOAT,
-            "pfxx" FLOAT,
-            "pfxz" FLOAT,
-            "x0" FLOAT,
-            "y0" FLOAT,
-            "z0" FLOAT,
-            "vx0" FLOAT,
-            "vy0" FLOAT,
-            "vz0" FLOAT,
-            "ax0" FLOAT,
-            "ay0" FLOAT,
-            "az0" FLOAT,
-            "HomeTeam" TEXT,
-            "AwayTeam" TEXT,
-            "Stadium" FLOAT,
-            "Level" FLOAT,
-            "League" FLOAT,
-            "GameID" TEXT,
-            "PitchUUID" TEXT,
-            "yt_RelSpeed" FLOAT,
-            "yt_RelHeight" FLOAT,
-            "yt_RelSide" FLOAT,
-            "yt_VertRelAngle" FLOAT,
-            "yt_HorzRelAngle" FLOAT,
-            "yt_ZoneSpeed" FLOAT,
-            "yt_PlateLocHeight" FLOAT,
-            "yt_PlateLocSide" FLOAT,
-            "yt_VertApprAngle" FLOAT,
-            "yt_HorzApprAngle" FLOAT,
-            "yt_ZoneTime" FLOAT,
-            "yt_HorzBreak" FLOAT,
-            "yt_InducedVertBreak" FLOAT,
-            "yt_OutOfPlane" FLOAT,
-            "yt_FSRI" FLOAT,
-            "yt_EffectiveSpin" FLOAT,
-            "yt_GyroSpin" FLOAT,
-            "yt_Efficiency" FLOAT,
-            "yt_SpinComponentX" FLOAT,
-            "yt_SpinComponentY" FLOAT,
-            "yt_SpinComponentZ" FLOAT,
-            "yt_HitVelocityX" FLOAT,
-            "yt_HitVelocityY" FLOAT,
-            "yt_HitVelocityZ" FLOAT,
-            "yt_HitLocationX" FLOAT,
-            "yt_HitLocationY" FLOAT,
-            "yt_HitLocationZ" FLOAT,
-            "yt_GroundLocationX" FLOAT,
-            "yt_GroundLocationY" FLOAT,
-            "yt_HitBreakX" FLOAT,
-            "yt_HitBreakY" FLOAT,
-            "yt_HitBreakT" FLOAT,
-            "yt_HitSpinComponentX" FLOAT,
-            "yt_HitSpinComponentY" FLOAT,
-            "yt_HitSpinComponentZ" FLOAT,
-            "yt_SessionName" FLOAT,
-            "Note" FLOAT,
-            "yt_PitchSpinConfidence" FLOAT,
-            "yt_PitchReleaseConfidence" FLOAT,
-            "yt_HitSpinConfidence" FLOAT,
-            "yt_EffectiveBattingSpeed" FLOAT,
-            "yt_ReleaseAccuracy" TEXT,
-            "yt_ZoneAccuracy" TEXT,
-            "yt_SeamLat" FLOAT,
-            "yt_SeamLong" FLOAT,
-            "yt_ReleaseDistance" FLOAT,
-            "Catcher" TEXT,
-            "CatcherId" FLOAT,
-            "CatcherTeam" TEXT,
-            "yt_AeroModel" TEXT
-        );
-        ''')
+        columns = ",\n".join(f'            "{name}" {sql_type}' for name, sql_type in YAKKERTECH_COLUMNS)
+        self.cursor.execute(f"CREATE TABLE yakkertech (\n{columns}\n        );")
+        self.invalidate_derived_data()
+        self.create_indexes()
+
+    def invalidate_derived_data(self):
+        """After rows were dropped or removed: bump the table generation, delete the Arrow snapshot
+        and rebuild the summary tables from what is left"""
+        bump_table_generation(self.connection, "yakkertech")
+        self.connection.commit()
+        PitchSnapshot(str(self.db_path), "yakkertech").delete()
+        PitchAggregates(str(self.db_path), "yakkertech").refresh()
+
+    def create_indexes(self):
+        """Create the unique pitch key and secondary indexes (no-op for ones that already exist)"""
+        ensure_pitch_key_index(self.connection)
+        for index_name, columns in YAKKERTECH_INDEXES.items():
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON yakkertech ({_column_list(columns)})")
+        self.cursor.execute("ANALYZE yakkertech")
+        self.connection.commit()
+
+    def remove_duplicate_pitches(self) -> int:
+        """Keep the first copy of each pitch key so the unique index can be built; returns rows removed"""
+        self.cursor.execute(
+            f"DELETE FROM yakkertech WHERE rowid NOT IN "
+            f"(SELECT MIN(rowid) FROM yakkertech GROUP BY {pitch_key_expression()})"
+        )
+        removed = self.cursor.rowcount
+        self.connection.commit()
+        return removed
+
+    def migrate(self):
+        """Bring an existing database up to the current schema without dropping its data"""
+        exists = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'yakkertech'"
+        ).fetchone()
+        if not exists:
+            self.create_table()
+            print("✅ Created table 'yakkertech' with indexes.")
+            return
+        removed = self.remove_duplicate_pitches()
+        self.invalidate_derived_data()
+        if removed:
+            print(f"⚠️  Removed {removed} duplicate pitch rows before adding the unique key")
+        self.create_indexes()
+        print("✅ Migrated table 'yakkertech': unique pitch key and secondary indexes in place.")
 
 def main():
     db = YakkerTechDB()
     db.connect()
-    db.create_table()
+    if sys.argv[1:] == ["migrate"]:
+        db.migrate()
+    else:
+        db.create_table()
     db.close()
 
 if __name__ == "__main__":
@@ -1,29 +1,43 @@
 import chromadb
 from chromadb.config import Settings
 import json
-import glob
 from collections import defaultdict
 import os
 from typing import Dict, List, Any
 import shutil
+import hashlib
+import uuid
+import numpy as np
+from embedding_store import EmbeddingStore
 
 # ------------------ Overview ------------------ #
-# This script creates a vector database from preprocessed chunks of text.
+# This script creates a vector database from the embedded chunks written by embed.py.
 # It provides functionality to load chunks, group them by collection, and upload them to a vector database.
+# By default collections are synced incrementally: only new or changed chunks are upserted and vanished
+# chunks are deleted, so the live index stays queryable. Pass rebuild=True to wipe and re-add everything.
+# Embeddings are streamed from the memory-mapped store one batch at a time.
+# Every change stamps the collection with a new sync generation so running queriers rebuild their
+# in-process indexes even when the collection size stayed the same.
 
 # ------------------ Config ------------------ #
-EMBEDDED_PATH = "unstructured/embedded/*.json"
+EMBEDDED_DIR = "unstructured/embedded"
 COLLECTION_SCHEMAS = {
     "rules": ["source", "document_name", "collection", "rule_title", "rule_number", "summary"],
     "coaching_videos": ["source", "channel_name", "channel_id", "collection", "video_title", "video_id", "url", "summary"],
     "data_dictionary": ["source", "document_name", "collection", "column_name", "column_letter"]
 }
+UPSERT_BATCH_SIZE = 1000
+# Collection metadata key rewritten after every change, so long-lived queriers notice same-size edits
+SYNC_GENERATION_KEY = "sync_generation"
 
 class VectorDBManager:
-    def __init__(self, db_path: str = "unstructured/vectordb"):
+    def __init__(self, db_path: str = "unstructured/vectordb", rebuild: bool = False,
+                 embedded_dir: str = EMBEDDED_DIR):
         self.db_path = db_path
-        # Clear existing database if it exists
-        if os.path.exists(self.db_path):
+        self.rebuild = rebuild
+        self.store = EmbeddingStore(embedded_dir)
+        # Clear existing database only for a full rebuild
+        if rebuild and os.path.exists(self.db_path):
             shutil.rmtree(self.db_path)
         self.client = self._initialize_client()
         
@@ -32,14 +46,15 @@ class VectorDBManager:
         os.makedirs(self.db_path, exist_ok=True)
         return chromadb.PersistentClient(path=self.db_path)
 
-    @staticmethod
-    def _load_chunks(path_pattern: str) -> List[Dict[str, Any]]:
-        """Load embedded chunks from JSON files"""
-        chunks = []
-        for json_file in glob.glob(path_pattern):
-            with open(json_file) as f:
-                chunks.extend(json.load(f))
-        return chunks
+    def _load_chunks(self) -> List[Dict[str, Any]]:
+        """Load chunk records (content and metadata, no embeddings) from the embedding store"""
+        return list(self.store.records())
+
+    def _iter_batches(self, chunks: List[Dict[str, Any]]):
+        """Yield batches of chunk records with their embeddings attached from the memory-mapped store"""
+        vectors = self.store.vectors()
+        for start in range(0, len(chunks), UPSERT_BATCH_SIZE):
+            yield self.store.attach_embeddings(chunks[start:start + UPSERT_BATCH_SIZE], vectors)
 
     @staticmethod
     def _group_by_collection(chunks: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
@@ -56,24 +71,89 @@ class VectorDBManager:
         schema = COLLECTION_SCHEMAS.get(collection_name, [])
         return {field: chunk.get("metadata", {}).get(field) for field in schema}
 
+    @staticmethod
+    def _content_hash(chunk: Dict[str, Any], metadata: Dict[str, Any]) -> str:
+        """Hash everything stored for a chunk so any change to it triggers an upsert"""
+        payload = json.dumps([chunk["content"], metadata], sort_keys=True).encode("utf-8")
+        payload += np.asarray(chunk["embedding"], dtype=np.float32).tobytes()
+        return hashlib.sha256(payload).hexdigest()
+
+    @staticmethod
+    def _existing_hashes(collection: Any) -> Dict[str, str]:
+        """Fetch {id: content_hash} for everything currently in a collection"""
+        existing = collection.get(include=["metadatas"])
+        return {
+            chunk_id: (metadata or {}).get("content_hash", "")
+            for chunk_id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+
+    @staticmethod
+    def _mark_synced(collection: Any) -> None:
+        """Stamp the collection with a new sync generation (see query_vector_db.py)"""
+        metadata = {key: value for key, value in (collection.metadata or {}).items() if not key.startswith("hnsw:")}
+        collection.modify(metadata={**metadata, SYNC_GENERATION_KEY: uuid.uuid4().hex})
+
     def upload_collection(self, collection_name: str, chunks: List[Dict[str, Any]]) -> None:
         """Upload chunks to a specific collection"""
         collection = self.client.get_or_create_collection(name=collection_name)
-        collection.add(
-            ids=[chunk["metadata"].get("id") for chunk in chunks],
-            embeddings=[chunk["embedding"] for chunk in chunks],
-            documents=[chunk["content"] for chunk in chunks],
-            metadatas=[self._build_metadata(chunk, collection_name) for chunk in chunks]
-        )
+        for batch in self._iter_batches(chunks):
+            metadatas = [self._build_metadata(chunk, collection_name) for chunk in batch]
+            for chunk, metadata in zip(batch, metadatas):
+                metadata["content_hash"] = self._content_hash(chunk, metadata)
+            collection.add(
+                ids=[chunk["metadata"].get("id") for chunk in batch],
+                embeddings=[chunk["embedding"] for chunk in batch],
+                documents=[chunk["content"] for chunk in batch],
+                metadatas=metadatas
+            )
+        self._mark_synced(collection)
         print(f"✅ Uploaded {len(chunks)} chunks to collection: '{collection_name}'")
 
+    def sync_collection(self, collection_name: str, chunks: List[Dict[str, Any]]) -> None:
+        """Upsert new or changed chunks and delete vanished ones, diffing by id and content hash"""
+        collection = self.client.get_or_create_collection(name=collection_name)
+        existing = self._existing_hashes(collection)
+
+        changed_count = 0
+        for batch in self._iter_batches(chunks):
+            changed = []
+            for chunk in batch:
+                metadata = self._build_metadata(chunk, collection_name)
+                metadata["content_hash"] = self._content_hash(chunk, metadata)
+                chunk_id = chunk["metadata"].get("id")
+                if existing.get(chunk_id) != metadata["content_hash"]:
+                    changed.append((chunk_id, chunk, metadata))
+
+            if changed:
+                collection.upsert(
+                    ids=[chunk_id for chunk_id, _, _ in changed],
+                    embeddings=[chunk["embedding"] for _, chunk, _ in changed],
+                    documents=[chunk["content"] for _, chunk, _ in changed],
+                    metadatas=[metadata for _, _, metadata in changed]
+                )
+                changed_count += len(changed)
+
+        current_ids = {chunk["metadata"].get("id") for chunk in chunks}
+        vanished = [chunk_id for chunk_id in existing if chunk_id not in current_ids]
+        for start in range(0, len(vanished), UPSERT_BATCH_SIZE):
+            collection.delete(ids=vanished[start:start + UPSERT_BATCH_SIZE])
+        if changed_count or vanished:
+            self._mark_synced(collection)
+
+        unchanged = len(chunks) - changed_count
+        print(f"✅ Synced collection '{collection_name}': {changed_count} upserted, "
+              f"{len(vanished)} deleted, {unchanged} unchanged")
+
     def process_all_chunks(self) -> None:
         """Process and upload all chunks to their respective collections"""
-        chunks = self._load_chunks(EMBEDDED_PATH)
+        chunks = self._load_chunks()
         grouped = self._group_by_collection(chunks)
         
         for collection_name, chunk_group in grouped.items():
-            self.upload_collection(collection_name, chunk_group)
+            if self.rebuild:
+                self.upload_collection(collection_name, chunk_group)
+            else:
+                self.sync_collection(collection_name, chunk_group)
 
 def main():
     vector_db = VectorDBManager()
@@ -1,20 +1,25 @@
 import json
-import glob
 from pathlib import Path
 from llms import embedder_chunks
+from embedding_store import EmbeddingStore
 from typing import List, Dict
 
 
 # ------------------ Overview ------------------ #
 # This script embeds text chunks from preprocessed JSON files using OpenAI's embedding model.
-# The embeddings are then stored alongside their original content in a new JSON file.
+# The embeddings are written to a memory-mappable matrix alongside a JSONL sidecar holding
+# each chunk's content and metadata (see embedding_store.py).
 
 class ChunkEmbedder:
-    def __init__(self, input_dir: str = "unstructured/preprocessed", 
-                 output_dir: str = "unstructured/embedded"):
+    def __init__(self, input_dir: str = "unstructured/preprocessed",
+                 output_dir: str = "unstructured/embedded",
+                 dtype: str = "float32",
+                 batch_size: int = 5000):
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.store = EmbeddingStore(output_dir, dtype=dtype)
+        self.batch_size = batch_size
 
     def load_chunks(self) -> List[Dict]:
         """Load and combine chunks from all JSON files in input directory"""
@@ -24,27 +29,15 @@ class ChunkEmbedder:
                 chunks.extend(json.load(f))
         return chunks
 
-    def embed_chunks(self, chunks: List[Dict], max_workers: int = 10) -> List[Dict]:
-        """Generate embeddings for chunks and combine them"""
-        texts = [chunk["content"] for chunk in chunks]
-        embeddings = embedder_chunks(texts, max_workers=max_workers)
-        print(f"Embedded {len(chunks)} chunks")
-
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk["embedding"] = embedding
-        return chunks
-
-    def save_embedded_chunks(self, embedded_chunks: List[Dict]):
-        """Save embedded chunks to output JSON file"""
-        output_file = self.output_dir / "embedded_chunks.json"
-        with open(output_file, "w") as f:
-            json.dump(embedded_chunks, f)
-
-    def process(self):
-        """Main processing pipeline"""
+    def process(self, max_workers: int = 10):
+        """Main processing pipeline, embedding and writing one batch at a time"""
         chunks = self.load_chunks()
-        embedded_chunks = self.embed_chunks(chunks)
-        self.save_embedded_chunks(embedded_chunks)
+        with self.store.writer(total=len(chunks)) as writer:
+            for start in range(0, len(chunks), self.batch_size):
+                batch = chunks[start:start + self.batch_size]
+                embeddings = embedder_chunks([chunk["content"] for chunk in batch], max_workers=max_workers)
+                writer.append(batch, embeddings)
+        print(f"Embedded {len(chunks)} chunks")
 
 
 def main():
@@ -0,0 +1,124 @@
+import sqlite3
+import hashlib
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# ------------------ Overview ------------------ #
+# This module provides a persistent, content-addressed cache for text embeddings.
+# Vectors are stored as float32 blobs in SQLite, keyed by (model, sha256(text)),
+# and the least recently used entries are evicted once the cache grows past its bound.
+
+DEFAULT_CACHE_PATH = "unstructured/embedding_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 20_000  # ~240MB at 3072 float32 dimensions
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._create_table()
+
+    def _create_table(self):
+        """Create the cache table if it does not exist"""
+        with self._lock:
+            self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings (
+                "key" TEXT PRIMARY KEY,
+                "model" TEXT NOT NULL,
+                "vector" BLOB NOT NULL,
+                "last_used" REAL NOT NULL
+            )
+            ''')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings ("last_used")')
+            self.connection.commit()
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """Hash chunk content so identical text maps to the same cache entry"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def make_key(cls, text: str, model: str) -> str:
+        """Build the cache key for a (model, content) pair"""
+        return f"{model}:{cls.content_hash(text)}"
+
+    @staticmethod
+    def _to_blob(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _from_blob(blob: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Return the cached embedding for a text, or None on a miss"""
+        return self.get_many([text], model).get(0)
+
+    def get_many(self, texts: List[str], model: str) -> Dict[int, List[float]]:
+        """Return cached embeddings keyed by position in `texts` (misses are omitted)"""
+        keys = [self.make_key(text, model) for text in texts]
+        found = {}
+        with self._lock:
+            # SQLite caps bound parameters per statement, so look keys up in slices
+            for start in range(0, len(keys), 500):
+                chunk = list(set(keys[start:start + 500]))
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f'SELECT "key", "vector" FROM embeddings WHERE "key" IN ({placeholders})', chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    'UPDATE embeddings SET "last_used" = ? WHERE "key" = ?',
+                    [(now, key) for key in found]
+                )
+                self.connection.commit()
+        return {i: self._from_blob(found[key]) for i, key in enumerate(keys) if key in found}
+
+    def put(self, text: str, model: str, vector: List[float]):
+        """Store a single embedding"""
+        self.put_many([text], model, [vector])
+
+    def put_many(self, texts: List[str], model: str, vectors: List[List[float]]):
+        """Store embeddings for texts, skipping empty (failed) vectors, then enforce the size bound"""
+        now = time.time()
+        rows = [(self.make_key(text, model), model, self._to_blob(vector), now)
+                for text, vector in zip(texts, vectors) if vector]
+        if not rows:
+            return
+        with self._lock:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO embeddings ("key", "model", "vector", "last_used") VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        """Delete least recently used entries beyond max_entries (caller holds the lock)"""
+        count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.connection.execute(
+                'DELETE FROM embeddings WHERE "key" IN '
+                '(SELECT "key" FROM embeddings ORDER BY "last_used" ASC LIMIT ?)',
+                (excess,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        """Close the cache database connection"""
+        with self._lock:
+            self.connection.close()
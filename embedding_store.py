@@ -0,0 +1,135 @@
+import json
+import os
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# ------------------ Overview ------------------ #
+# This module stores embedded chunks in a compact binary layout instead of one big JSON file:
+# - embeddings.npy: a (rows x dims) float32 or float16 matrix that can be memory-mapped
+# - chunks.jsonl:   one JSON record per row with the chunk's id, content and metadata
+# Writers stream batches to temporary files and swap them in on close, so readers never see
+# a half-written store. Readers memory-map the matrix and stream the sidecar line by line.
+
+VECTORS_FILE = "embeddings.npy"
+RECORDS_FILE = "chunks.jsonl"
+
+
+class EmbeddingStoreWriter:
+    def __init__(self, store: "EmbeddingStore", total: int):
+        self.store = store
+        self.total = total
+        self.row = 0
+        self._vectors = None
+        self._tmp_vectors = store.vectors_path.with_suffix(".npy.tmp")
+        self._tmp_records = store.records_path.with_suffix(".jsonl.tmp")
+        self._records = open(self._tmp_records, "w")
+
+    def _allocate(self, dims: int):
+        """Create the memory-mapped matrix once the embedding width is known"""
+        self._vectors = np.lib.format.open_memmap(
+            self._tmp_vectors, mode="w+", dtype=self.store.dtype, shape=(self.total, dims)
+        )
+
+    def append(self, chunks: List[Dict[str, Any]], embeddings: List[List[float]]):
+        """Write a batch of chunks and their embeddings (empty embeddings are marked as failed)"""
+        for chunk, embedding in zip(chunks, embeddings):
+            if self.row >= self.total:
+                raise ValueError(f"Embedding store writer was sized for {self.total} rows")
+            embedded = len(embedding) > 0
+            if embedded and self._vectors is None:
+                self._allocate(len(embedding))
+            if embedded:
+                self._vectors[self.row] = embedding
+            self._records.write(json.dumps({
+                "row": self.row,
+                "embedded": embedded,
+                "content": chunk["content"],
+                "metadata": chunk.get("metadata", {})
+            }) + "\n")
+            self.row += 1
+
+    def close(self):
+        """Flush both files and atomically replace the previous store"""
+        self._records.close()
+        if self._vectors is None:
+            self._allocate(0)
+        self._vectors.flush()
+        del self._vectors
+        os.replace(self._tmp_vectors, self.store.vectors_path)
+        os.replace(self._tmp_records, self.store.records_path)
+        print(f"💾 Wrote {self.row} embedded chunks to {self.store.store_dir}")
+
+    def abort(self):
+        """Discard the temporary files and keep the previous store"""
+        self._records.close()
+        self._vectors = None
+        for path in (self._tmp_vectors, self._tmp_records):
+            if path.exists():
+                path.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class EmbeddingStore:
+    def __init__(self, store_dir: str = "unstructured/embedded", dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be 'float32' or 'float16'")
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self.vectors_path = self.store_dir / VECTORS_FILE
+        self.records_path = self.store_dir / RECORDS_FILE
+
+    def exists(self) -> bool:
+        """Check whether a complete store has been written"""
+        return self.vectors_path.exists() and self.records_path.exists()
+
+    def writer(self, total: int) -> EmbeddingStoreWriter:
+        """Open a streaming writer for `total` rows"""
+        return EmbeddingStoreWriter(self, total)
+
+    def vectors(self) -> np.ndarray:
+        """Memory-map the embedding matrix read-only (stored dtype, no copy)"""
+        return np.load(self.vectors_path, mmap_mode="r")
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Stream sidecar records for successfully embedded rows"""
+        with open(self.records_path) as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("embedded", True):
+                    yield record
+
+    def get_embeddings(self, rows: List[int], vectors: Optional[np.ndarray] = None) -> np.ndarray:
+        """Read the given rows from the matrix as float32"""
+        vectors = self.vectors() if vectors is None else vectors
+        return np.asarray(vectors[rows], dtype=np.float32)
+
+    def attach_embeddings(self, records: List[Dict[str, Any]],
+                          vectors: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Return chunk dicts for the given records with an 'embedding' list attached"""
+        embeddings = self.get_embeddings([record["row"] for record in records], vectors)
+        return [
+            {"content": record["content"], "metadata": record["metadata"], "embedding": embedding.tolist()}
+            for record, embedding in zip(records, embeddings)
+        ]
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Stream embedded chunks in batches without loading the whole store"""
+        vectors = self.vectors()
+        batch = []
+        for record in self.records():
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield self.attach_embeddings(batch, vectors)
+                batch = []
+        if batch:
+            yield self.attach_embeddings(batch, vectors)
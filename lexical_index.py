@@ -0,0 +1,116 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+# ------------------ Overview ------------------ #
+# This module provides keyword retrieval for the text collections (rules, coaching videos):
+# - BM25Index: an in-memory inverted index with Okapi BM25 scoring
+# - RuleNumberIndex: a direct rule_number -> chunk lookup table for "what does rule 6.4 say"
+# - reciprocal_rank_fusion: merges ranked lists from BM25 and vector search
+
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)*|[a-z]+")
+RULE_REFERENCE_PATTERN = re.compile(r"\brules?\s+(\d+(?:\.\d+)+)", re.IGNORECASE)
+RULE_NUMBER_PATTERN = re.compile(r"\b\d+\.\d+\b")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word and rule-number tokens ("6.4" stays one token)"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+                 k1: float = 1.5, b: float = 0.75):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.k1 = k1
+        self.b = b
+
+        self.postings: Dict[str, List[tuple]] = defaultdict(list)
+        self.lengths = []
+        for doc_index, document in enumerate(self.documents):
+            tokens = tokenize(document or "")
+            self.lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                self.postings[term].append((doc_index, frequency))
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        self.idf = {
+            term: math.log(1 + (len(self.documents) - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+
+    @classmethod
+    def from_collection(cls, collection: Any) -> "BM25Index":
+        """Build the index from every document in a Chroma collection"""
+        data = collection.get(include=["documents", "metadatas"])
+        return cls(data["ids"], data["documents"], data["metadatas"])
+
+    def search(self, query: str, top_n: int) -> List[Dict]:
+        """Return the top_n documents by BM25 score, best first"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_index, frequency in self.postings[term]:
+                length_norm = 1 - self.b + self.b * self.lengths[doc_index] / (self.average_length or 1.0)
+                scores[doc_index] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_n]
+        return [{
+            "id": self.ids[doc_index],
+            "document": self.documents[doc_index],
+            "metadata": self.metadatas[doc_index],
+            "bm25_score": score
+        } for doc_index, score in ranked]
+
+
+class RuleNumberIndex:
+    def __init__(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        self.rules: Dict[str, Dict] = {}
+        for chunk_id, document, metadata in zip(ids, documents, metadatas):
+            rule_number = (metadata or {}).get("rule_number")
+            if rule_number and rule_number not in self.rules:
+                self.rules[rule_number] = {"id": chunk_id, "document": document, "metadata": metadata}
+
+    @classmethod
+    def from_collection(cls, collection: Any) -> "RuleNumberIndex":
+        """Build the lookup table from a Chroma collection's rule_number metadata"""
+        data = collection.get(include=["documents", "metadatas"])
+        return cls(data["ids"], data["documents"], data["metadatas"])
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @staticmethod
+    def is_lookup(query: str) -> bool:
+        """True when the query explicitly asks for a rule by number ("rule 6.4")"""
+        return RULE_REFERENCE_PATTERN.search(query) is not None
+
+    def lookup(self, query: str) -> List[Dict]:
+        """Return chunks for every known rule number mentioned in the query, in order of mention"""
+        results = []
+        for rule_number in RULE_NUMBER_PATTERN.findall(query):
+            rule = self.rules.get(rule_number)
+            if rule and rule not in results:
+                results.append(rule)
+        return results
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict]], key: str = "id", k: int = 60,
+                           weights: Optional[List[float]] = None) -> List[Dict]:
+    """
+    Merge ranked result lists with Reciprocal Rank Fusion (score = sum of w / (k + rank)).
+    The first occurrence of each item supplies its fields; later lists only add score.
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    fused: Dict[str, Dict] = {}
+    for results, weight in zip(ranked_lists, weights):
+        for rank, result in enumerate(results, start=1):
+            entry = fused.setdefault(result[key], {**result, "fusion_score": 0.0})
+            for field, value in result.items():
+                entry.setdefault(field, value)
+            entry["fusion_score"] += weight / (k + rank)
+    return sorted(fused.values(), key=lambda entry: entry["fusion_score"], reverse=True)
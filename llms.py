@@ -1,14 +1,19 @@
 import openai
 import os
+import time
+import threading
 from dotenv import load_dotenv
 from typing import List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from langchain_openai import ChatOpenAI
+from embedding_cache import EmbeddingCache
 
 # ------------------ Overview ------------------ #
 # This module provides LLM-related functionality including:
 # - Text summarization using GPT models
 # - Semantic reranking of search results
-# - Text embedding using OpenAI's embedding model
+# - Text embedding using OpenAI's embedding model (batched, order-preserving)
+# - Shared, long-lived chat clients for the router and agents (one connection pool per model)
 
 
 
@@ -18,6 +23,21 @@ load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 client = openai.OpenAI(api_key=api_key)
 
+_chat_llms = {}
+_chat_llms_lock = threading.Lock()
+
+
+def get_chat_llm(model: str = "gpt-4o-mini", temperature: float = 0) -> ChatOpenAI:
+    """
+    Return a process-wide ChatOpenAI client so HTTP connections are kept alive between prompts.
+    Callers that want token streaming enable it per call with .bind(stream=True).
+    """
+    key = (model, temperature)
+    with _chat_llms_lock:
+        if key not in _chat_llms:
+            _chat_llms[key] = ChatOpenAI(model=model, temperature=temperature, api_key=api_key)
+        return _chat_llms[key]
+
 
 
 # ------------------ Summarizer ------------------ #
@@ -94,43 +114,169 @@ def summarize_chunks(chunks: list[str], max_workers: int = 10) -> list[str]:
 
 
 # ------------------ Embedder ------------------ #
-def embedder_chunk(text: str, model="text-embedding-3-large") -> list:
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the shared on-disk embedding cache, opening it on first use"""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+
+def embedder_chunk(text: str, model="text-embedding-3-large", use_cache: bool = True) -> list:
     """
     Creates an embedding vector for a single text chunk using OpenAI's embedding model.
 
     Args:
         text (str): The text to embed
         model (str, optional): The OpenAI embedding model to use. Defaults to "text-embedding-3-large"
+        use_cache (bool, optional): Read from and write to the shared embedding cache. Defaults to True
 
     Returns:
         list: The embedding vector for the input text
     """
+    cache = get_embedding_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get(text, model)
+        if cached is not None:
+            return cached
+
     response = openai.embeddings.create(
         model=model,
         input=text
     )
-    return response.data[0].embedding
+    embedding = response.data[0].embedding
+
+    if cache is not None:
+        cache.put(text, model, embedding)
+    return embedding
+
+# Request limits for the embeddings endpoint (inputs per request / tokens per request)
+EMBED_MAX_BATCH_SIZE = 2048
+EMBED_MAX_BATCH_TOKENS = 300_000
+EMBED_MAX_RETRIES = 3
+
+
+def _estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for batch packing"""
+    return max(1, len(text) // 4 + 1)
+
+
+def _pack_batches(texts: list[str], max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+                  max_batch_tokens: int = EMBED_MAX_BATCH_TOKENS) -> list[list[int]]:
+    """
+    Packs text indices into consecutive batches that respect the per-request
+    input count and token limits.
+
+    Args:
+        texts (list[str]): Texts to pack
+        max_batch_size (int, optional): Maximum number of inputs per request
+        max_batch_tokens (int, optional): Maximum estimated tokens per request
+
+    Returns:
+        list[list[int]]: Batches of indices into `texts`, in input order
+    """
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = _estimate_tokens(text)
+        if current and (len(current) >= max_batch_size or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _embed_batch(texts: list[str], model: str, max_retries: int = EMBED_MAX_RETRIES) -> tuple[list[list[float]], int]:
+    """
+    Embeds one batch in a single request, retrying with backoff. If the batch
+    keeps failing it is split in half so only the failing inputs are dropped.
+
+    Args:
+        texts (list[str]): Texts in this batch
+        model (str): The OpenAI embedding model to use
+        max_retries (int, optional): Attempts per (sub-)batch before splitting
+
+    Returns:
+        tuple[list[list[float]], int]: Embeddings in input order (empty lists for
+                                       inputs that failed) and the number of requests made
+    """
+    requests_made = 0
+    for attempt in range(max_retries):
+        requests_made += 1
+        try:
+            response = client.embeddings.create(model=model, input=texts)
+            # The API tags each item with its input index; never rely on response order
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)], requests_made
+        except Exception as e:
+            print(f"Embedding batch of {len(texts)} failed (attempt {attempt + 1}/{max_retries}):", e)
+            if attempt < max_retries - 1:
+                time.sleep(2 ** attempt)
 
-def embedder_chunks(texts: list[str], model="text-embedding-3-large", max_workers=10) -> list[list[float]]:
+    if len(texts) == 1:
+        return [[]], requests_made
+
+    mid = len(texts) // 2
+    left, left_requests = _embed_batch(texts[:mid], model, max_retries)
+    right, right_requests = _embed_batch(texts[mid:], model, max_retries)
+    return left + right, requests_made + left_requests + right_requests
+
+
+def embedder_chunks(texts: list[str], model="text-embedding-3-large", max_workers=10,
+                    max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+                    max_batch_tokens: int = EMBED_MAX_BATCH_TOKENS,
+                    use_cache: bool = True) -> list[list[float]]:
     """
-    Creates embedding vectors for multiple text chunks in parallel using ThreadPoolExecutor.
+    Creates embedding vectors for multiple text chunks, packing many inputs into
+    each request and sending the batches in parallel using ThreadPoolExecutor.
 
     Args:
         texts (list[str]): List of text chunks to embed
         model (str, optional): The OpenAI embedding model to use. Defaults to "text-embedding-3-large"
-        max_workers (int, optional): Maximum number of threads to use. Defaults to 10
+        max_workers (int, optional): Maximum number of concurrent requests. Defaults to 10
+        max_batch_size (int, optional): Maximum number of inputs per request
+        max_batch_tokens (int, optional): Maximum estimated tokens per request
+        use_cache (bool, optional): Only send texts missing from the shared embedding cache. Defaults to True
 
     Returns:
         list[list[float]]: List of embedding vectors in the same order as input texts.
                           Empty lists are returned for any chunks that fail to embed.
     """
-    embeddings = []
+    if not texts:
+        return []
+
+    start = time.perf_counter()
+    embeddings: list[list[float]] = [[] for _ in texts]
+
+    cache = get_embedding_cache() if use_cache else None
+    if cache is not None:
+        for i, embedding in cache.get_many(texts, model).items():
+            embeddings[i] = embedding
+    missing = [i for i, embedding in enumerate(embeddings) if not embedding]
+    cache_hits = len(texts) - len(missing)
+
+    missing_texts = [texts[i] for i in missing]
+    batches = _pack_batches(missing_texts, max_batch_size, max_batch_tokens)
+    total_requests = 0
+
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(embedder_chunk, text, model) for text in texts]
-        for future in as_completed(futures):
-            try:
-                embeddings.append(future.result())
-            except Exception as e:
-                print("Embedding failed:", e)
-                embeddings.append([])
-    return embeddings
\ No newline at end of file
+        results = executor.map(lambda batch: _embed_batch([missing_texts[i] for i in batch], model), batches)
+        for batch, (batch_embeddings, requests_made) in zip(batches, results):
+            total_requests += requests_made
+            for i, embedding in zip(batch, batch_embeddings):
+                embeddings[missing[i]] = embedding
+
+    if cache is not None and missing:
+        cache.put_many(missing_texts, model, [embeddings[i] for i in missing])
+
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for embedding in embeddings if not embedding)
+    print(f"Embedded {len(texts) - failed}/{len(texts)} texts ({cache_hits} from cache) in {len(batches)} batches "
+          f"({total_requests} requests, {elapsed:.2f}s, {len(texts) / max(elapsed, 1e-9):.1f} texts/s)")
+    return embeddings
@@ -1,10 +1,23 @@
+import sys
+import time
 import pandas as pd
 import sqlite3
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from create_sqlite_db import ensure_pitch_key_index
+from pitch_snapshot import PitchSnapshot
+from pitch_aggregates import PitchAggregates
 
 # ------------------ Overview ------------------ #
 # This script loads data from a CSV file into a SQLite database.
 # It provides functionality to validate column names, filter duplicates, and load new data.
+# Duplicates are rejected by SQLite itself: the table's unique pitch key plus INSERT OR IGNORE,
+# so the cost of a load depends only on the size of the CSV, not on the rows already stored.
+# load_directory bulk-loads every CSV in a folder: files are parsed in parallel in chunks by worker
+# processes (CSV parsing and tuple conversion hold the GIL, so threads would run them one at a
+# time) while a single WAL-mode writer connection inserts each file in one transaction.
+#
+# Usage: python load_data_to_sqlite.py [csv file or directory]
 
 class YakkerTechDataLoader:
     def __init__(self, db_path: str = "sqllite_db.db"):
@@ -40,25 +53,56 @@ class YakkerTechDataLoader:
             return False
         return True
 
-    def filter_duplicates(self, new_data: pd.DataFrame) -> pd.DataFrame:
-        """Remove rows that already exist in database"""
-        existing_data = pd.read_sql("SELECT * FROM yakkertech", self.connection)
-        
-        # Create composite key for comparison
-        for df in [new_data, existing_data]:
-            df['combined_key'] = (df['PitchNo'].astype(str) + '_' + 
-                                df['Date'].astype(str) + '_' + 
-                                df['Time'].astype(str))
-        
-        # Find and clean new rows
-        new_rows = new_data[~new_data['combined_key'].isin(existing_data['combined_key'])]
-        new_rows = new_rows.drop(columns=['combined_key'])
-        
-        duplicate_count = len(new_data) - len(new_rows)
+    def ensure_pitch_key(self) -> bool:
+        """Make sure the unique pitch key exists so INSERT OR IGNORE can skip duplicates"""
+        try:
+            ensure_pitch_key_index(self.connection)
+            return True
+        except sqlite3.IntegrityError:
+            print("❌ Existing rows contain duplicate pitches - run `python create_sqlite_db.py migrate` first.")
+            return False
+
+    @staticmethod
+    def _to_records(data: pd.DataFrame) -> list:
+        """Convert a DataFrame to plain Python tuples with NaN mapped to NULL"""
+        return list(data.astype(object).where(data.notna(), None).itertuples(index=False, name=None))
+
+    def _insert_records(self, columns: list, record_batches: list) -> int:
+        """INSERT OR IGNORE batches of tuples in a single transaction; returns rows added"""
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        placeholders = ", ".join("?" * len(columns))
+        statement = f"INSERT OR IGNORE INTO yakkertech ({column_list}) VALUES ({placeholders})"
+        before = self.connection.total_changes
+        with self.connection:
+            for records in record_batches:
+                self.cursor.executemany(statement, records)
+        return self.connection.total_changes - before
+
+    def insert_new_rows(self, data: pd.DataFrame) -> int:
+        """Insert rows in one transaction, letting the unique pitch key drop duplicates; returns rows added"""
+        inserted = self._insert_records(list(data.columns), [self._to_records(data)])
+
+        duplicate_count = len(data) - inserted
         if duplicate_count > 0:
             print(f"⚠️  Found {duplicate_count} duplicate rows - skipping these")
-            
-        return new_rows
+        return inserted
+
+    def max_rowid(self) -> int:
+        self.cursor.execute("SELECT COALESCE(MAX(rowid), 0) FROM yakkertech")
+        return self.cursor.fetchone()[0]
+
+    def refresh_aggregates(self, min_rowid: int):
+        """Recompute the summary tables for games that received rows after min_rowid"""
+        aggregates = PitchAggregates(self.db_path)
+        aggregates.refresh(aggregates.games_after(min_rowid))
+
+    def refresh_snapshot(self):
+        """Append newly inserted rows to the Arrow snapshot the agent loads from"""
+        try:
+            PitchSnapshot(self.db_path).refresh()
+        except Exception as e:
+            # The snapshot is only a cache; the agent falls back to SQLite for rows it lacks
+            print(f"⚠️  Could not refresh pitch snapshot: {e}")
 
     def load_data(self, csv_path: str):
         """Main method to load CSV data into database"""
@@ -70,27 +114,93 @@ class YakkerTechDataLoader:
             self.connect_db()
             
             # Validate schema
-            if not self.validate_columns(data):
+            if not self.validate_columns(data) or not self.ensure_pitch_key():
                 return
                 
-            # Filter duplicates
-            new_rows = self.filter_duplicates(data)
-            
-            # Upload new data
-            if len(new_rows) > 0:
-                new_rows.to_sql(name="yakkertech", con=self.connection, 
-                              if_exists="append", index=False)
-                print(f"✅ Successfully added {len(new_rows)} new rows to table 'yakkertech'.")
+            # Upload new data, skipping duplicates
+            watermark = self.max_rowid()
+            inserted = self.insert_new_rows(data)
+            if inserted > 0:
+                print(f"✅ Successfully added {inserted} new rows to table 'yakkertech'.")
+                self.refresh_aggregates(watermark)
+                self.refresh_snapshot()
             else:
                 print("ℹ️  No new rows to add - all rows already exist in database.")
                 
         finally:
             self.close_db()
 
+    @classmethod
+    def _parse_csv(cls, csv_path: Path, chunksize: int) -> tuple:
+        """Parse one CSV in chunks into insert-ready tuples (runs in a worker process)"""
+        start = time.perf_counter()
+        columns, record_batches = None, []
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            columns = list(chunk.columns)
+            record_batches.append(cls._to_records(chunk))
+        return columns, record_batches, time.perf_counter() - start
+
+    def load_directory(self, directory: str, pattern: str = "*.csv", max_workers: int = 4,
+                       chunksize: int = 50_000):
+        """Bulk-load every matching CSV in a directory and print a per-file and total rows/sec summary"""
+        csv_paths = sorted(Path(directory).glob(pattern))
+        if not csv_paths:
+            print(f"ℹ️  No files matching '{pattern}' in {directory}")
+            return
+
+        start = time.perf_counter()
+        try:
+            self.connect_db()
+            self.cursor.execute("PRAGMA journal_mode=WAL")
+            self.cursor.execute("PRAGMA synchronous=NORMAL")
+            table_columns = self.get_table_columns()
+            if not self.ensure_pitch_key():
+                return
+            watermark = self.max_rowid()
+
+            summary = []
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [(path, executor.submit(self._parse_csv, path, chunksize)) for path in csv_paths]
+                # Insert in file order (not completion order) so rowids follow the sorted file list;
+                # later files keep parsing while earlier ones are written
+                for path, future in futures:
+                    try:
+                        columns, record_batches, parse_seconds = future.result()
+                    except Exception as e:
+                        print(f"❌ {path.name}: failed to parse ({e})")
+                        continue
+                    if columns != table_columns:
+                        print(f"❌ {path.name}: column mismatch with table schema - skipped")
+                        continue
+
+                    insert_start = time.perf_counter()
+                    inserted = self._insert_records(columns, record_batches)
+                    insert_seconds = time.perf_counter() - insert_start
+                    rows = sum(len(records) for records in record_batches)
+                    summary.append((path.name, rows, inserted, parse_seconds, insert_seconds))
+        finally:
+            self.close_db()
+
+        total_seconds = time.perf_counter() - start
+        print(f"{'file':<40} {'rows':>8} {'added':>8} {'parse s':>8} {'insert s':>9} {'rows/s':>10}")
+        for name, rows, inserted, parse_seconds, insert_seconds in summary:
+            rate = rows / max(parse_seconds + insert_seconds, 1e-9)
+            print(f"{name[:40]:<40} {rows:>8} {inserted:>8} {parse_seconds:>8.2f} {insert_seconds:>9.2f} {rate:>10.0f}")
+        total_rows = sum(row[1] for row in summary)
+        total_inserted = sum(row[2] for row in summary)
+        if total_inserted:
+            self.refresh_aggregates(watermark)
+            self.refresh_snapshot()
+        print(f"✅ {len(summary)}/{len(csv_paths)} files, {total_rows} rows ({total_inserted} new) "
+              f"in {total_seconds:.2f}s - {total_rows / max(total_seconds, 1e-9):.0f} rows/s")
+
 def main():
-    csv_path = "yakker_data/Syracuse@Georgia Tech Game 3.csv"
+    path = sys.argv[1] if len(sys.argv) > 1 else "yakker_data/Syracuse@Georgia Tech Game 3.csv"
     loader = YakkerTechDataLoader()
-    loader.load_data(csv_path)
+    if Path(path).is_dir():
+        loader.load_directory(path)
+    else:
+        loader.load_data(path)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,214 @@
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+# ------------------ Overview ------------------ #
+# This module provides an in-process vector index for small Chroma collections.
+# Vectors are loaded once into a pre-normalized float32 matrix and searched with a single
+# matrix-vector product plus argpartition, avoiding Chroma's SQLite/HNSW round trip.
+# Distances follow the collection's configured space ("l2", "cosine" or "ip") so results
+# line up with what Chroma itself would return.
+#
+# Optionally the first pass runs over a compressed copy of the matrix: truncated to the leading
+# dimensions (text-embedding-3 vectors are Matryoshka-trained) and/or quantized to float16 or int8.
+# The best `rerank_factor * top_n` candidates are then re-ranked with the full-precision vectors.
+# In that mode the full matrix is only read for the candidate rows, so it can stay memory-mapped
+# (see from_store) and only the compressed copy needs to live in RAM. NumPy has no fast float16
+# or int8 matmul, so quantization mostly buys memory; truncation is what cuts first-pass latency.
+# Run benchmark_retrieval.py for the recall/latency/memory trade-off on the real corpus.
+
+QUANTIZATIONS = (None, "float16", "int8")
+
+
+class NumpyVectorIndex:
+    def __init__(self, ids: List[str], embeddings: Any, documents: List[str],
+                 metadatas: List[Dict[str, Any]], space: str = "l2",
+                 first_pass_dims: Optional[int] = None, quantization: Optional[str] = None,
+                 rerank_factor: int = 4):
+        if space not in ("l2", "cosine", "ip"):
+            raise ValueError(f"Unsupported distance space: {space}")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.space = space
+
+        self.first_pass_dims = first_pass_dims
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+
+        # A float32 memmap passes through without a copy
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        self.norms = np.linalg.norm(vectors, axis=1) if len(vectors) else np.zeros(0, dtype=np.float32)
+        self._safe_norms = np.where(self.norms > 0, self.norms, 1.0).astype(np.float32)
+        if self.compressed:
+            # Full vectors are only touched for re-ranking, so leave them where they are
+            self.full_vectors, self.unit_vectors = vectors, None
+        else:
+            # Unit vectors for the dot product; raw norms are kept to reconstruct l2 / ip distances
+            self.full_vectors = None
+            self.unit_vectors = vectors / self._safe_norms[:, None] if len(vectors) else vectors
+        self._coarse, self._coarse_scales = self._build_first_pass()
+
+    @property
+    def compressed(self) -> bool:
+        return self.first_pass_dims is not None or self.quantization is not None
+
+    def _truncate(self, vectors: np.ndarray) -> np.ndarray:
+        """Keep the leading dimensions and re-normalize each row"""
+        if self.first_pass_dims is None:
+            return vectors
+        truncated = vectors[..., :self.first_pass_dims]
+        norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+        return truncated / np.where(norms > 0, norms, 1.0)
+
+    def _unit_rows(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Unit-length vectors for all rows or the given rows"""
+        if self.unit_vectors is not None:
+            return self.unit_vectors if rows is None else self.unit_vectors[rows]
+        vectors = self.full_vectors if rows is None else self.full_vectors[rows]
+        norms = self._safe_norms if rows is None else self._safe_norms[rows]
+        return np.asarray(vectors, dtype=np.float32) / norms[:, None]
+
+    def _build_first_pass(self):
+        """Build the compressed matrix (and per-row int8 scales) used for candidate generation"""
+        if not self.compressed or not len(self.norms):
+            return None, None
+        coarse = self._truncate(self._unit_rows())
+        if self.quantization == "float16":
+            return coarse.astype(np.float16), None
+        if self.quantization == "int8":
+            scales = np.abs(coarse).max(axis=1) / 127.0
+            scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+            return np.round(coarse / scales[:, None]).astype(np.int8), scales
+        return np.ascontiguousarray(coarse, dtype=np.float32), None
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Bytes held by the full-precision matrix and by the first-pass matrix"""
+        coarse = 0
+        if self._coarse is not None:
+            coarse = self._coarse.nbytes + (self._coarse_scales.nbytes if self._coarse_scales is not None else 0)
+        full = self.unit_vectors if self.unit_vectors is not None else self.full_vectors
+        in_memory = not isinstance(full, np.memmap)
+        return {"full": int(full.nbytes), "full_in_memory": in_memory, "first_pass": int(coarse)}
+
+    def _first_pass_scores(self, query: np.ndarray, block_rows: int = 256) -> np.ndarray:
+        """Approximate cosine similarity of the query against every row"""
+        query = self._truncate(query).astype(np.float32)
+        if self.quantization is None:
+            return self._coarse @ query
+        scores = np.empty(len(self._coarse), dtype=np.float32)
+        # Upcast block by block so a query never materializes a full float32 copy
+        for start in range(0, len(self._coarse), block_rows):
+            block = self._coarse[start:start + block_rows].astype(np.float32)
+            scores[start:start + block_rows] = block @ query
+        if self._coarse_scales is not None:
+            scores *= self._coarse_scales
+        return scores
+
+    @staticmethod
+    def _collection_space(collection: Any) -> str:
+        """Read the distance space a Chroma collection was created with"""
+        metadata = getattr(collection, "metadata", None) or {}
+        return metadata.get("hnsw:space", "l2")
+
+    @classmethod
+    def from_collection(cls, collection: Any, **kwargs) -> "NumpyVectorIndex":
+        """Load every vector, document and metadata from a Chroma collection"""
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        return cls(
+            ids=data["ids"],
+            embeddings=data["embeddings"] if data["embeddings"] is not None else [],
+            documents=data["documents"],
+            metadatas=data["metadatas"],
+            space=cls._collection_space(collection),
+            **kwargs
+        )
+
+    @classmethod
+    def from_store(cls, store: Any, space: str = "l2", **kwargs) -> "NumpyVectorIndex":
+        """Build an index over an EmbeddingStore, keeping the full matrix memory-mapped"""
+        records = list(store.records())
+        rows = [record["row"] for record in records]
+        vectors = store.vectors()
+        if vectors.dtype == np.float32 and rows == list(range(len(vectors))):
+            embeddings = vectors
+        else:
+            embeddings = store.get_embeddings(rows, vectors)
+        return cls(
+            ids=[record["metadata"].get("id") for record in records],
+            embeddings=embeddings,
+            documents=[record["content"] for record in records],
+            metadatas=[record["metadata"] for record in records],
+            space=space,
+            **kwargs
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _distances(self, query_embedding: List[float], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Compute exact distances from the query to every row (or the given rows) in the collection's space"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = float(np.linalg.norm(query))
+        unit_vectors = self._unit_rows(rows)
+        norms = self.norms if rows is None else self.norms[rows]
+        cosine = unit_vectors @ (query / query_norm if query_norm > 0 else query)
+        if self.space == "cosine":
+            return 1.0 - cosine
+        dot = cosine * norms * query_norm
+        if self.space == "ip":
+            return 1.0 - dot
+        # Chroma's l2 space reports squared euclidean distance
+        return np.maximum(norms ** 2 + query_norm ** 2 - 2.0 * dot, 0.0)
+
+    @staticmethod
+    def _top_k(values: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k smallest values, sorted ascending"""
+        candidates = np.argpartition(values, k - 1)[:k]
+        return candidates[np.argsort(values[candidates], kind="stable")]
+
+    def _candidate_rows(self, query_embedding: List[float], top_n: int) -> Optional[np.ndarray]:
+        """Rows to re-rank exactly, or None when the first pass is disabled"""
+        if not self.compressed:
+            return None
+        k = min(len(self.ids), max(top_n, top_n * self.rerank_factor))
+        if k >= len(self.ids):
+            return None
+        query = np.asarray(query_embedding, dtype=np.float32)
+        return self._top_k(-self._first_pass_scores(query), k)
+
+    def search(self, query_embedding: List[float], top_n: int) -> List[Dict]:
+        """Return the top_n nearest rows in the same format as VectorDBQuerier._process_results"""
+        if not self.ids or top_n <= 0:
+            return []
+        rows = self._candidate_rows(query_embedding, top_n)
+        distances = self._distances(query_embedding, rows)
+        order = self._top_k(distances, min(top_n, len(distances)))
+        indices = order if rows is None else rows[order]
+        return [{
+            "id": self.ids[i],
+            "document": self.documents[i],
+            "metadata": self.metadatas[i],
+            "distance": float(distances[j])
+        } for i, j in zip(indices, order)]
+
+    def matches_chroma(self, collection: Any, probes: Optional[int] = 5, top_n: int = 5,
+                       tolerance: float = 1e-3) -> bool:
+        """
+        Check that this index returns the same neighbours as Chroma, using a few stored
+        vectors as probe queries. Rows are compared as (document, distance) pairs so
+        ties in distance may appear in either order.
+        """
+        for i in range(min(probes, len(self.ids))):
+            query = (self._unit_rows(np.array([i]))[0] * self.norms[i]).tolist()
+            ours = self.search(query, top_n)
+            theirs = collection.query(query_embeddings=[query], n_results=top_n,
+                                      include=["documents", "distances"])
+            their_documents = theirs["documents"][0]
+            their_distances = theirs["distances"][0]
+            if sorted(r["document"] for r in ours) != sorted(their_documents):
+                return False
+            if not np.allclose([r["distance"] for r in ours], their_distances, atol=tolerance):
+                return False
+        return True
@@ -0,0 +1,181 @@
+import sqlite3
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+
+# ------------------ Overview ------------------ #
+# This module maintains small rollup tables next to the yakkertech pitch log so common coach
+# questions (pitch mix, velo/spin by pitch type, whiff and called-strike rates, exit velocity)
+# don't need the raw rows. Each table is stored per game with additive columns (counts and
+# sums), so an ingest only recomputes the games it touched. load() combines them into
+# pitcher/batter/game/pitch-type summary frames for the agent's Python namespace.
+# Per-game deltas only apply on top of complete tables: when the rollups don't exist yet they
+# are built from every game first. Pitches without a GameID are rolled up under GameID ''.
+
+SWING_CALLS = ("StrikeSwinging", "Foul", "FoulTip", "InPlay")
+HIT_RESULTS = ("Single", "Double", "Triple", "HomeRun")
+
+
+def _in_list(values: Iterable[str]) -> str:
+    return ", ".join(f"'{value}'" for value in values)
+
+
+# Additive per-game measures shared by every rollup: (column, type, SQL expression)
+MEASURES = [
+    ("pitches", "INTEGER", "COUNT(*)"),
+    ("rel_speed_sum", "REAL", "SUM(RelSpeed)"),
+    ("rel_speed_n", "INTEGER", "COUNT(RelSpeed)"),
+    ("spin_rate_sum", "REAL", "SUM(SpinRate)"),
+    ("spin_rate_n", "INTEGER", "COUNT(SpinRate)"),
+    ("swings", "INTEGER", f"COALESCE(SUM(PitchCall IN ({_in_list(SWING_CALLS)})), 0)"),
+    ("whiffs", "INTEGER", "COALESCE(SUM(PitchCall = 'StrikeSwinging'), 0)"),
+    ("called_strikes", "INTEGER", "COALESCE(SUM(PitchCall = 'StrikeCalled'), 0)"),
+    ("balls_in_play", "INTEGER", "COALESCE(SUM(PitchCall = 'InPlay'), 0)"),
+    ("exit_speed_sum", "REAL", "SUM(CASE WHEN PitchCall = 'InPlay' THEN ExitSpeed END)"),
+    ("exit_speed_n", "INTEGER", "COUNT(CASE WHEN PitchCall = 'InPlay' THEN ExitSpeed END)"),
+    ("max_exit_speed", "REAL", "MAX(CASE WHEN PitchCall = 'InPlay' THEN ExitSpeed END)"),
+    ("hits", "INTEGER", f"COALESCE(SUM(PlayResult IN ({_in_list(HIT_RESULTS)})), 0)"),
+    ("strikeouts", "INTEGER", "COALESCE(SUM(KorBB = 'Strikeout'), 0)"),
+    ("walks", "INTEGER", "COALESCE(SUM(KorBB = 'Walk'), 0)"),
+]
+
+# Rollup tables keyed by game: table -> list of (column, SQL expression) grouping keys
+AGGREGATE_TABLES = {
+    "agg_pitcher_game": [
+        ("GameID", "COALESCE(GameID, '')"),
+        ("Date", "MAX(Date)"),
+        ("Pitcher", "COALESCE(Pitcher, '')"),
+        ("PitcherTeam", "MAX(PitcherTeam)"),
+        ("TaggedPitchType", "COALESCE(NULLIF(TaggedPitchType, ''), 'Untagged')"),
+    ],
+    "agg_batter_game": [
+        ("GameID", "COALESCE(GameID, '')"),
+        ("Date", "MAX(Date)"),
+        ("Batter", "COALESCE(Batter, '')"),
+        ("BatterTeam", "MAX(BatterTeam)"),
+    ],
+    "agg_game": [
+        ("GameID", "COALESCE(GameID, '')"),
+        ("Date", "MAX(Date)"),
+        ("HomeTeam", "MAX(HomeTeam)"),
+        ("AwayTeam", "MAX(AwayTeam)"),
+    ],
+}
+
+SUMMARY_DESCRIPTION = """Precomputed summary DataFrames (a few hundred rows each, always current):
+- pitcher_summary: one row per Pitcher and TaggedPitchType (pitches, usage, avg_rel_speed, avg_spin_rate, whiff_rate, csw_rate, avg_exit_speed)
+- pitch_type_summary: one row per TaggedPitchType with the same measures
+- batter_summary: one row per Batter (pitches_seen, swings, whiff_rate, balls_in_play, hits, avg_exit_speed, max_exit_speed, strikeouts, walks)
+- game_summary: one row per GameID (Date, HomeTeam, AwayTeam, pitches, whiff_rate, csw_rate, avg_exit_speed, hits)
+Prefer these over aggregating df for pitch mix, velocity/spin, whiff and exit velocity questions."""
+
+
+def _is_aggregate(expression: str) -> bool:
+    return expression.startswith(("MAX(", "MIN("))
+
+
+class PitchAggregates:
+    def __init__(self, db_path: str = "structured/sqllite_db.db", table_name: str = "yakkertech"):
+        self.db_path = db_path
+        self.table_name = table_name
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def create_tables(self, conn: sqlite3.Connection):
+        """Create the rollup tables if they don't exist yet"""
+        for table, keys in AGGREGATE_TABLES.items():
+            key_columns = [name for name, expression in keys if not _is_aggregate(expression)]
+            columns = [f'"{name}" TEXT' for name, _ in keys] + [f"{name} {kind}" for name, kind, _ in MEASURES]
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)}, "
+                         f"PRIMARY KEY ({', '.join(key_columns)}))")
+
+    def exists(self) -> bool:
+        with self._connect() as conn:
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return set(AGGREGATE_TABLES) <= names
+
+    def games_after(self, min_rowid: int) -> List[str]:
+        """GameIDs of pitch rows inserted after the given rowid ('' stands for a missing GameID)"""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT DISTINCT COALESCE(GameID, '') FROM {self.table_name} WHERE rowid > ?",
+                                (min_rowid,))
+            return [row[0] for row in rows]
+
+    def refresh(self, game_ids: Optional[List[str]] = None):
+        """Recompute the rollups for the given games (every game when None, or when the tables are new)"""
+        if game_ids is not None and not game_ids:
+            return
+        if not self.exists():
+            # A delta on empty tables would leave out every game ingested before them
+            game_ids = None
+        with self._connect() as conn:
+            self.create_tables(conn)
+            for table, keys in AGGREGATE_TABLES.items():
+                select = [f'{expression} AS "{name}"' for name, expression in keys]
+                select += [f"{expression} AS {name}" for name, _, expression in MEASURES]
+                group_by = ", ".join(expression for _, expression in keys if not _is_aggregate(expression))
+                if game_ids is None:
+                    conn.execute(f"DELETE FROM {table}")
+                    where, params = "", ()
+                else:
+                    placeholders = ", ".join("?" for _ in game_ids)
+                    conn.execute(f"DELETE FROM {table} WHERE GameID IN ({placeholders})", game_ids)
+                    # Stays an IN list on the raw column so idx_yakkertech_game is used
+                    where = f"WHERE GameID IN ({placeholders})" + (" OR GameID IS NULL" if "" in game_ids else "")
+                    params = game_ids
+                conn.execute(f"INSERT INTO {table} SELECT {', '.join(select)} FROM {self.table_name} "
+                             f"{where} GROUP BY {group_by}", params)
+            conn.commit()
+        scope = "all games" if game_ids is None else f"{len(game_ids)} game(s)"
+        print(f"📈 Refreshed summary tables for {scope}")
+
+    @staticmethod
+    def _rates(df: pd.DataFrame) -> pd.DataFrame:
+        """Turn summed measures into averages and rates"""
+        df["avg_rel_speed"] = df["rel_speed_sum"] / df["rel_speed_n"].where(df["rel_speed_n"] > 0)
+        df["avg_spin_rate"] = df["spin_rate_sum"] / df["spin_rate_n"].where(df["spin_rate_n"] > 0)
+        df["avg_exit_speed"] = df["exit_speed_sum"] / df["exit_speed_n"].where(df["exit_speed_n"] > 0)
+        df["whiff_rate"] = df["whiffs"] / df["swings"].where(df["swings"] > 0)
+        df["csw_rate"] = (df["called_strikes"] + df["whiffs"]) / df["pitches"].where(df["pitches"] > 0)
+        return df.drop(columns=[name for name, _, _ in MEASURES if name.endswith(("_sum", "_n"))])
+
+    @classmethod
+    def _rollup(cls, df: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+        sums = [name for name, _, _ in MEASURES if name != "max_exit_speed"]
+        grouped = df.groupby(keys, as_index=False, observed=True)
+        rolled = grouped[sums].sum().merge(grouped["max_exit_speed"].max(), on=keys)
+        return cls._rates(rolled)
+
+    def load(self) -> Dict[str, pd.DataFrame]:
+        """Read the rollups and return pitcher/pitch type/batter/game summary frames"""
+        if not self.exists():
+            self.refresh()
+        with self._connect() as conn:
+            pitcher_games = pd.read_sql_query("SELECT * FROM agg_pitcher_game", conn)
+            batter_games = pd.read_sql_query("SELECT * FROM agg_batter_game", conn)
+            games = pd.read_sql_query("SELECT * FROM agg_game", conn)
+
+        pitcher_summary = self._rollup(pitcher_games, ["Pitcher", "TaggedPitchType"])
+        totals = pitcher_summary.groupby("Pitcher")["pitches"].transform("sum")
+        pitcher_summary.insert(3, "usage", pitcher_summary["pitches"] / totals)
+
+        pitch_type_summary = self._rollup(pitcher_games, ["TaggedPitchType"])
+        pitch_type_summary.insert(2, "usage", pitch_type_summary["pitches"] / pitch_type_summary["pitches"].sum())
+
+        batter_summary = self._rollup(batter_games, ["Batter"]).rename(columns={"pitches": "pitches_seen"})
+
+        game_summary = self._rates(games.copy())
+
+        return {
+            "pitcher_summary": pitcher_summary,
+            "pitch_type_summary": pitch_type_summary,
+            "batter_summary": batter_summary,
+            "game_summary": game_summary,
+        }
+
+
+if __name__ == "__main__":
+    aggregates = PitchAggregates()
+    aggregates.refresh()
+    for name, frame in aggregates.load().items():
+        print(f"{name}: {len(frame)} rows")
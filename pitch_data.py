@@ -0,0 +1,272 @@
+import re
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Optional
+from pitch_snapshot import PitchSnapshot, table_generation
+
+# ------------------ Overview ------------------ #
+# This module loads the yakkertech pitch table into a compact pandas DataFrame.
+# - Numeric columns are downcast (float64 -> float32, int64 -> smallest int that fits)
+# - Low-cardinality text columns (Pitcher, Batter, TaggedPitchType, PitchCall, ...) become categoricals
+# - Only a core set of columns is read up front; the rest are fetched from SQLite the first
+#   time they are accessed (df["yt_GyroSpin"], df.yt_GyroSpin) or referenced in agent code
+# - refresh() appends rows inserted since the last load, using PRAGMA data_version to notice
+#   commits cheaply and a max-rowid watermark to fetch only the new rows
+# - Full reads come from the memory-mapped Arrow snapshot (pitch_snapshot.py) when one exists;
+#   only rows newer than the snapshot are read from SQLite
+
+# Columns most analysis and visualization prompts touch; everything else loads on demand
+CORE_COLUMNS = [
+    "PitchNo", "Date", "Time", "GameID", "Inning", "Top/Bottom", "Outs", "Balls", "Strikes",
+    "Pitcher", "PitcherThrows", "PitcherTeam", "Batter", "BatterSide", "BatterTeam",
+    "TaggedPitchType", "PitchCall", "KorBB", "HitType", "PlayResult",
+    "RelSpeed", "SpinRate", "InducedVertBreak", "HorzBreak", "PlateLocHeight", "PlateLocSide",
+    "ExitSpeed", "Angle", "Distance"
+]
+CATEGORY_MAX_RATIO = 0.5
+# Identifier columns (PitcherId, GameID, PitchUUID, ...) stay text even when every value looks numeric
+IDENTIFIER_PATTERN = re.compile(r"(Id|ID|UUID)$")
+
+
+def compact_frame(df: pd.DataFrame, category_max_ratio: float = CATEGORY_MAX_RATIO) -> pd.DataFrame:
+    """Downcast numeric columns and convert repetitive text columns to categoricals, in place"""
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_float_dtype(series):
+            df[column] = pd.to_numeric(series, downcast="float")
+        elif pd.api.types.is_integer_dtype(series):
+            df[column] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            # All-NULL and numeric-as-text columns come back as objects; keep them numeric when nothing is lost
+            numeric = pd.to_numeric(series, errors="coerce")
+            if numeric.notna().sum() == series.notna().sum() and not IDENTIFIER_PATTERN.search(str(column)):
+                # float32 only when every value survives the downcast, float64 otherwise
+                df[column] = pd.to_numeric(numeric.astype("float64"), downcast="float")
+            elif series.nunique(dropna=True) <= category_max_ratio * len(series):
+                df[column] = series.astype("category")
+    return df
+
+
+def concat_frames(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Append rows while keeping categorical columns categorical (categories are unioned)"""
+    new = new[[column for column in old.columns if column in new.columns]].copy()
+    old = old.copy()
+    for column in old.columns:
+        if isinstance(old[column].dtype, pd.CategoricalDtype) and column in new.columns:
+            categories = old[column].cat.categories.union(pd.Index(new[column].dropna().unique()))
+            old[column] = old[column].cat.set_categories(categories)
+            new[column] = pd.Categorical(new[column], categories=categories)
+        elif (column in new.columns and new[column].dtype != old[column].dtype
+              and pd.api.types.is_numeric_dtype(old[column]) and pd.api.types.is_numeric_dtype(new[column])):
+            # Widen both sides to a dtype that holds every value (int8 + int16 -> int16), never narrow
+            dtype = np.result_type(old[column].dtype, new[column].dtype)
+            old[column] = old[column].astype(dtype)
+            new[column] = new[column].astype(dtype)
+    return pd.concat([old, new], ignore_index=True)
+
+
+class PitchDataLoader:
+    def __init__(self, db_path: str = "structured/sqllite_db.db", table_name: str = "yakkertech",
+                 use_snapshot: bool = True, snapshot_path: Optional[str] = None):
+        self.db_path = db_path
+        self.table_name = table_name
+        self.snapshot = PitchSnapshot(db_path, table_name, snapshot_path) if use_snapshot else None
+        self._watch_connection = None
+        self._last_data_version = None
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def table_columns(self) -> List[str]:
+        """Column names of the table in schema order"""
+        with self._connect() as conn:
+            return [row[1] for row in conn.execute(f"PRAGMA table_info({self.table_name})")]
+
+    @staticmethod
+    def _select_list(columns: Iterable[str]) -> str:
+        return ", ".join(f'"{column}"' for column in columns)
+
+    def _read_sqlite(self, columns: List[str], min_rowid: int) -> pd.DataFrame:
+        query = (f"SELECT rowid AS _rowid, {self._select_list(columns)} FROM {self.table_name} "
+                 f"WHERE rowid > ? ORDER BY rowid")
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=(min_rowid,))
+        return df.set_index("_rowid")
+
+    def _snapshot_usable(self, columns: List[str]) -> bool:
+        """The snapshot can serve a read if it has every column and still matches the table"""
+        if self.snapshot is None or not self.snapshot.exists():
+            return False
+        return (set(columns) <= set(self.snapshot.columns())
+                and self.snapshot.max_rowid() <= self.max_rowid()
+                and self.snapshot.is_current())
+
+    def read(self, columns: Optional[List[str]] = None, min_rowid: int = 0) -> pd.DataFrame:
+        """Read the given columns (all if None) for rows after min_rowid, indexed by SQLite rowid"""
+        columns = columns or self.table_columns()
+        if min_rowid == 0 and self._snapshot_usable(columns):
+            df = self.snapshot.read(columns)
+            newer = self._read_sqlite(columns, self.snapshot.max_rowid())
+            if len(newer):
+                df = pd.concat([df, newer])
+        else:
+            df = self._read_sqlite(columns, min_rowid)
+        return compact_frame(df)
+
+    def max_rowid(self) -> int:
+        """Highest rowid in the table (0 when empty)"""
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {self.table_name}").fetchone()[0]
+
+    def generation(self) -> int:
+        """Table generation, bumped whenever create_table or migrate rebuilds the table"""
+        with self._connect() as conn:
+            return table_generation(conn, self.table_name)
+
+    def row_count(self, max_rowid: int) -> int:
+        """Number of rows at or below the given rowid"""
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table_name} WHERE rowid <= ?",
+                                (max_rowid,)).fetchone()[0]
+
+    def has_changes(self) -> bool:
+        """Cheap check for commits from other connections since the last call (PRAGMA data_version)"""
+        if self._watch_connection is None:
+            self._watch_connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        version = self._watch_connection.execute("PRAGMA data_version").fetchone()[0]
+        changed = self._last_data_version is not None and version != self._last_data_version
+        self._last_data_version = version
+        return changed
+
+    def _wrap(self, data: pd.DataFrame, rowids, table_columns: List[str], version: int = 0) -> "LazyPitchFrame":
+        frame = LazyPitchFrame(data)
+        frame._loader = self
+        frame._rowids = rowids
+        frame._table_columns = table_columns
+        frame._version = version
+        frame._generation = self.generation()
+        return frame
+
+    def load(self, lazy: bool = True) -> "LazyPitchFrame":
+        """Load the core columns (or every column when lazy=False) into a LazyPitchFrame"""
+        self.has_changes()  # start watching from this point
+        available = self.table_columns()
+        columns = [column for column in CORE_COLUMNS if column in available] if lazy else available
+        data = self.read(columns)
+        return self._wrap(data.reset_index(drop=True), data.index.to_numpy(), available)
+
+    def refresh(self, frame: "LazyPitchFrame") -> "LazyPitchFrame":
+        """
+        Return a frame that includes rows appended since `frame` was loaded. Only rows above the
+        rowid watermark are read. If rows at or below the watermark were removed or replaced
+        (e.g. the table was rebuilt) the frame is reloaded in full. The same object is returned when nothing changed.
+        """
+        if not self.has_changes():
+            return frame
+        watermark = int(frame._rowids.max()) if len(frame._rowids) else 0
+        latest = self.max_rowid()
+        # A rebuild can land on the same watermark, so also compare the row count below it
+        rebuilt = (latest < watermark or self.generation() != frame._generation
+                   or self.row_count(watermark) != len(frame._rowids))
+        if latest == watermark and not rebuilt:
+            return frame
+        version = frame._version + 1
+        if rebuilt:
+            reloaded = self.load(lazy=list(frame.columns) != frame.all_columns)
+            reloaded._version = version
+            return reloaded
+
+        new_rows = self.read(list(frame.columns), min_rowid=watermark)
+        combined = concat_frames(pd.DataFrame(frame), new_rows.reset_index(drop=True))
+        rowids = np.concatenate([frame._rowids, new_rows.index.to_numpy()])
+        print(f"🔄 Appended {len(new_rows)} new rows from '{self.table_name}' (data version {version})")
+        return self._wrap(combined, rowids, frame._table_columns, version)
+
+
+class LazyPitchFrame(pd.DataFrame):
+    """A DataFrame that pulls missing yakkertech columns from SQLite the first time they are used"""
+
+    _metadata = ["_loader", "_rowids", "_table_columns", "_version", "_generation"]
+
+    @property
+    def _constructor(self):
+        # Slices, filters and groupby results are ordinary DataFrames
+        return pd.DataFrame
+
+    def _missing(self, keys: Iterable) -> List[str]:
+        table_columns = getattr(self, "_table_columns", None) or []
+        loaded = set(self.columns)
+        return [key for key in keys if isinstance(key, str) and key in table_columns and key not in loaded]
+
+    def load_columns(self, columns: Iterable[str]) -> List[str]:
+        """Fetch the given columns from SQLite if they are not loaded yet; returns what was loaded"""
+        missing = self._missing(columns)
+        loader = getattr(self, "_loader", None)
+        if not missing or loader is None:
+            return []
+        data = loader.read(missing).reindex(self._rowids)
+        for column in missing:
+            # Assign positionally: data is already aligned to this frame's row order
+            pd.DataFrame.__setitem__(self, column, data[column].array)
+        return missing
+
+    def load_columns_for(self, code: str) -> List[str]:
+        """Load every table column referenced by name in a code snippet (quoted or as an attribute)"""
+        referenced = set(re.findall(r"[\"']([^\"']+)[\"']", code))
+        referenced.update(re.findall(r"\.(\w+)", code))
+        return self.load_columns(referenced)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            self.load_columns([key])
+        elif isinstance(key, (list, tuple, pd.Index)):
+            self.load_columns(list(key))
+        return super().__getitem__(key)
+
+    def __getattr__(self, name):
+        if not name.startswith("_") and name in (self.__dict__.get("_table_columns") or []):
+            self.load_columns([name])
+        return super().__getattr__(name)
+
+    @property
+    def version(self) -> int:
+        """Counter bumped every time new rows are appended; downstream caches can key on it"""
+        return getattr(self, "_version", 0)
+
+    @property
+    def all_columns(self) -> List[str]:
+        """Every column available in the table, loaded or not"""
+        return list(getattr(self, "_table_columns", None) or self.columns)
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """Deep memory usage of a frame in megabytes"""
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def compare_memory(db_path: str = "structured/sqllite_db.db", table_name: str = "yakkertech",
+                   scale: int = 100):
+    """Print baseline vs compacted memory for the current table and a `scale`x replicated copy"""
+    loader = PitchDataLoader(db_path, table_name)
+    with sqlite3.connect(db_path) as conn:
+        baseline = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
+    full = compact_frame(baseline.copy())
+    lazy = loader.load(lazy=True)
+
+    print(f"📊 {len(baseline)} rows x {len(baseline.columns)} columns")
+    print(f"  SELECT *           : {memory_mb(baseline):8.2f} MB")
+    print(f"  compacted (all)    : {memory_mb(full):8.2f} MB")
+    print(f"  compacted (core)   : {memory_mb(lazy):8.2f} MB")
+
+    scaled_baseline = pd.concat([baseline] * scale, ignore_index=True)
+    scaled_full = compact_frame(scaled_baseline.copy())
+    core = [column for column in CORE_COLUMNS if column in scaled_full.columns]
+    print(f"📊 {scale}x: {len(scaled_baseline)} rows")
+    print(f"  SELECT *           : {memory_mb(scaled_baseline):8.2f} MB")
+    print(f"  compacted (all)    : {memory_mb(scaled_full):8.2f} MB")
+    print(f"  compacted (core)   : {memory_mb(scaled_full[core]):8.2f} MB")
+
+
+if __name__ == "__main__":
+    compare_memory()
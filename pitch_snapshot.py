@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# ------------------ Overview ------------------ #
+# This module keeps a columnar snapshot of the yakkertech table next to the SQLite database
+# (structured/sqllite_db.arrow, an uncompressed Arrow IPC file). Readers memory-map the file
+# and pull only the columns they need, so agent start-up no longer decodes SQLite rows.
+# The snapshot records the highest SQLite rowid it contains; refresh() appends only rows
+# above that watermark and rewrites the file atomically. Rows past the watermark that have
+# not been snapshotted yet are still read from SQLite by PitchDataLoader.
+# The watermark alone can't tell a rebuilt table from the original, so the snapshot also
+# records its row count and the table generation (bumped by create_table/migrate); a
+# snapshot whose count or generation no longer matches SQLite is rebuilt, never served.
+
+ROWID_COLUMN = "_rowid"
+WATERMARK_KEY = b"max_rowid"
+ROW_COUNT_KEY = b"row_count"
+GENERATION_KEY = b"generation"
+GENERATION_TABLE = "table_generations"
+
+
+def table_generation(conn: sqlite3.Connection, table_name: str) -> int:
+    """Current generation of a table (0 until it is first rebuilt or migrated)"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (GENERATION_TABLE,)).fetchone()
+    if not exists:
+        return 0
+    row = conn.execute(f"SELECT generation FROM {GENERATION_TABLE} WHERE table_name = ?", (table_name,)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_table_generation(conn: sqlite3.Connection, table_name: str):
+    """Mark a table as rebuilt so existing snapshots of it are no longer trusted"""
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {GENERATION_TABLE} (table_name TEXT PRIMARY KEY, generation INTEGER)")
+    conn.execute(f"INSERT INTO {GENERATION_TABLE} VALUES (?, 1) "
+                 f"ON CONFLICT(table_name) DO UPDATE SET generation = generation + 1", (table_name,))
+
+
+class PitchSnapshot:
+    def __init__(self, db_path: str = "structured/sqllite_db.db", table_name: str = "yakkertech",
+                 snapshot_path: Optional[str] = None):
+        self.db_path = db_path
+        self.table_name = table_name
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else Path(db_path).with_suffix(".arrow")
+
+    def exists(self) -> bool:
+        return self.snapshot_path.exists()
+
+    def _open(self) -> pa.Table:
+        """Memory-map the snapshot; column buffers are not copied until used"""
+        source = pa.memory_map(str(self.snapshot_path), "r")
+        return pa.ipc.open_file(source).read_all()
+
+    def _metadata(self) -> dict:
+        if not self.exists():
+            return {}
+        source = pa.memory_map(str(self.snapshot_path), "r")
+        return pa.ipc.open_file(source).schema.metadata or {}
+
+    def max_rowid(self) -> int:
+        """Highest SQLite rowid contained in the snapshot (0 if there is none)"""
+        return int(self._metadata().get(WATERMARK_KEY, b"0"))
+
+    def is_current(self) -> bool:
+        """True when the snapshot still matches the rows up to its watermark in SQLite"""
+        metadata = self._metadata()
+        if ROW_COUNT_KEY not in metadata or GENERATION_KEY not in metadata:
+            return False
+        watermark = int(metadata[WATERMARK_KEY])
+        with sqlite3.connect(self.db_path) as conn:
+            generation = table_generation(conn, self.table_name)
+            count = conn.execute(f"SELECT COUNT(*) FROM {self.table_name} WHERE rowid <= ?",
+                                 (watermark,)).fetchone()[0]
+        return int(metadata[GENERATION_KEY]) == generation and int(metadata[ROW_COUNT_KEY]) == count
+
+    def delete(self):
+        """Remove the snapshot file (the next refresh rebuilds it)"""
+        self.snapshot_path.unlink(missing_ok=True)
+
+    def columns(self) -> List[str]:
+        """Table columns stored in the snapshot"""
+        source = pa.memory_map(str(self.snapshot_path), "r")
+        return [name for name in pa.ipc.open_file(source).schema.names if name != ROWID_COLUMN]
+
+    def read(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read the given columns (all if None) as a DataFrame indexed by SQLite rowid"""
+        table = self._open()
+        names = [ROWID_COLUMN] + (columns if columns is not None else self.columns())
+        return table.select(names).to_pandas().set_index(ROWID_COLUMN)
+
+    def _read_sqlite(self, min_rowid: int) -> Tuple[pd.DataFrame, int]:
+        """Rows above min_rowid and the table generation, read in one transaction"""
+        query = f"SELECT rowid AS {ROWID_COLUMN}, * FROM {self.table_name} WHERE rowid > ? ORDER BY rowid"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("BEGIN")
+            generation = table_generation(conn, self.table_name)
+            return pd.read_sql_query(query, conn, params=(min_rowid,)), generation
+
+    @staticmethod
+    def _to_arrow(df: pd.DataFrame) -> pa.Table:
+        for column in df.columns:
+            if df[column].dtype != object:
+                continue
+            values = df[column].dropna()
+            if values.empty:
+                # All-NULL columns are stored as float so later rows can fill them
+                df[column] = df[column].astype("float64")
+            elif values.map(type).nunique() > 1:
+                # SQLite allows mixed storage classes in one column; Arrow does not
+                df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    def _write(self, table: pa.Table, generation: int):
+        """Write the snapshot to a temp file and swap it in so readers never see a partial file"""
+        watermark = int(pc.max(table[ROWID_COLUMN]).as_py() or 0) if len(table) else 0
+        table = table.replace_schema_metadata({
+            WATERMARK_KEY: str(watermark).encode(),
+            ROW_COUNT_KEY: str(len(table)).encode(),
+            GENERATION_KEY: str(generation).encode(),
+        })
+        tmp_path = self.snapshot_path.with_suffix(".arrow.tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def refresh(self) -> int:
+        """Bring the snapshot up to date with SQLite; returns the number of rows appended"""
+        watermark = self.max_rowid()
+        with sqlite3.connect(self.db_path) as conn:
+            latest = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {self.table_name}").fetchone()[0]
+
+        current = self.exists() and latest >= watermark and self.is_current()
+        if current and watermark == latest:
+            return 0
+        if not current:
+            # First snapshot, or the table was rebuilt or had rows deleted underneath us
+            rows, generation = self._read_sqlite(0)
+            table = self._to_arrow(rows)
+            self._write(table, generation)
+            print(f"📦 Wrote snapshot of {len(table)} rows to {self.snapshot_path}")
+            return len(table)
+
+        rows, generation = self._read_sqlite(watermark)
+        new_rows = self._to_arrow(rows)
+        existing = self._open().replace_schema_metadata(None)
+        try:
+            table = pa.concat_tables([existing, new_rows], promote_options="permissive")
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # A column changed type (e.g. text arriving in a previously numeric column): rebuild
+            rows, generation = self._read_sqlite(0)
+            table = self._to_arrow(rows)
+        self._write(table, generation)
+        print(f"📦 Appended {len(new_rows)} rows to snapshot {self.snapshot_path}")
+        return len(new_rows)
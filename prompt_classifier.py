@@ -0,0 +1,134 @@
+import re
+import numpy as np
+from typing import Callable, Dict, Iterable, List, Optional
+from llms import embedder_chunks
+from column_index import split_identifier
+
+# ------------------ Overview ------------------ #
+# This module routes obvious prompts without an LLM call. Two local checks run in order:
+# 1. Keyword rules: plotting verbs mark a visualization, softball vocabulary, column names
+#    and player names from the data mark a prompt as relevant
+# 2. Nearest centroid: the prompt embedding is compared with the mean embedding of a few
+#    labelled example prompts per route (the examples are embedded once and cached)
+# classify() only ever returns a positive route. It returns None when neither check is
+# confident or when the prompt looks irrelevant, and the router falls back to the LLM, so a
+# local miss can never turn away a softball question.
+
+# Inflections are listed explicitly so "pieces", "graphic" or "drawer" don't match
+VISUALIZATION_PATTERN = re.compile(
+    r"\b(plots?|plotted|plotting|charts?|charted|charting|graphs?|graphed|graphing|"
+    r"visuali[sz](?:e|es|ed|ing|ation|ations)|histograms?|scatter ?plots?|scatter|heat ?maps?|"
+    r"bar ?charts?|line ?charts?|pie ?charts?|pie|box ?plots?|draw|draws|drawing|drew|diagrams?)\b",
+    re.IGNORECASE
+)
+# Softball-only vocabulary. Words shared with baseball or everyday English ("pitch", "pitcher",
+# "spin rate", "home run", "inning") go to the centroid check and, failing that, the LLM
+SOFTBALL_PATTERN = re.compile(
+    r"\b(softballs?|fastpitch|fast-pitch|rise ?balls?|drop ?balls?|yakker ?tech|yakkertech|yakker)\b",
+    re.IGNORECASE
+)
+
+# Labelled examples for the nearest-centroid check
+ROUTE_EXAMPLES = {
+    "analysis": [
+        "What is the average spin rate by pitch type?",
+        "Which pitcher had the highest whiff rate last game?",
+        "How many strikeouts did we record against Syracuse?",
+        "What does the rule say about an illegal pitch?",
+        "Compare exit velocity between our top batters",
+        "What drills help with rise ball command?",
+    ],
+    "visualization": [
+        "Plot release speed over the course of the game",
+        "Make a chart of pitch mix for each pitcher",
+        "Show a heatmap of pitch locations for strikes",
+        "Graph spin rate against induced vertical break",
+        "Draw a histogram of exit speeds on balls in play",
+    ],
+    "irrelevant": [
+        "What's the weather like tomorrow?",
+        "Write me a poem about the ocean",
+        "Who won the NBA finals?",
+        "How do I cook pasta?",
+        "Translate this sentence into French",
+    ],
+}
+
+
+class LocalPromptClassifier:
+    def __init__(self, embed: Callable[[str], List[float]],
+                 embedding_model: str = "text-embedding-3-large",
+                 names: Optional[Iterable[str]] = None,
+                 columns: Optional[Iterable[str]] = None,
+                 min_similarity: float = 0.5, min_margin: float = 0.1):
+        self.embed = embed
+        self.embedding_model = embedding_model
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.names = set()
+        self.columns = set()
+        self.update_vocabulary(names or [], columns or [])
+        self._centroids: Optional[Dict[str, np.ndarray]] = None
+
+    def update_vocabulary(self, names: Iterable[str], columns: Iterable[str]):
+        """Register player names and column names that mark a prompt as relevant"""
+        for name in names:
+            if not name:
+                continue
+            self.names.add(name.lower())
+            # Coaches usually refer to players by last name
+            parts = name.split()
+            if len(parts) > 1 and len(parts[-1]) > 2:
+                self.names.add(parts[-1].lower())
+        # Single-word columns (Date, Time, Outs, ...) are too generic to signal relevance
+        self.columns.update(column.lower() for column in columns if column and len(split_identifier(column)) > 1)
+
+    def _mentions_data(self, prompt: str) -> bool:
+        lowered = prompt.lower()
+        words = set(re.findall(r"[a-z0-9_/']+", lowered))
+        if words & self.columns:
+            return True
+        return any(name in words if " " not in name else name in lowered for name in self.names)
+
+    def _keyword_route(self, prompt: str) -> Optional[Dict]:
+        """Return a route when the prompt is relevant by keyword; plotting verbs pick visualization"""
+        if not (SOFTBALL_PATTERN.search(prompt) or self._mentions_data(prompt)):
+            return None
+        prompt_type = "visualization" if VISUALIZATION_PATTERN.search(prompt) else "analysis"
+        return {"relevant": True, "prompt_type": prompt_type, "source": "keywords"}
+
+    def _get_centroids(self) -> Dict[str, np.ndarray]:
+        """Embed the labelled examples once (through the persistent embedding cache)"""
+        if self._centroids is None:
+            labels = [label for label, examples in ROUTE_EXAMPLES.items() for _ in examples]
+            texts = [text for examples in ROUTE_EXAMPLES.values() for text in examples]
+            embeddings = np.asarray(embedder_chunks(texts, model=self.embedding_model), dtype=np.float32)
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+            self._centroids = {}
+            for label in ROUTE_EXAMPLES:
+                centroid = embeddings[[i for i, item in enumerate(labels) if item == label]].mean(axis=0)
+                self._centroids[label] = centroid / np.linalg.norm(centroid)
+        return self._centroids
+
+    def _centroid_route(self, prompt: str) -> Optional[Dict]:
+        """Return the nearest route when it is a relevant one and wins by a clear margin"""
+        query = np.asarray(self.embed(prompt), dtype=np.float32)
+        query /= np.linalg.norm(query)
+        scores = sorted(((float(centroid @ query), label) for label, centroid in self._get_centroids().items()),
+                        reverse=True)
+        (best, label), (runner_up, _) = scores[0], scores[1]
+        if best < self.min_similarity or best - runner_up < self.min_margin or label == "irrelevant":
+            # Turning a prompt away is left to the LLM
+            return None
+        return {"relevant": True, "prompt_type": label, "source": "centroid"}
+
+    def classify(self, prompt: str) -> Optional[Dict]:
+        """Route the prompt locally, or return None when the LLM should decide"""
+        route = self._keyword_route(prompt)
+        if route:
+            return route
+        try:
+            return self._centroid_route(prompt)
+        except Exception as e:
+            print(f"Warning: nearest-centroid routing unavailable ({e}).")
+            return None
@@ -1,12 +1,18 @@
-import sqlite3
+import queue
+import threading
 import pandas as pd
+from typing import Any, Dict, Iterator
 from langchain.agents import AgentExecutor, create_openai_tools_agent
-from langchain_openai import ChatOpenAI
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from dotenv import load_dotenv
-import os
 from query_vector_db import VectorDBQuerier
-from tools import SmartPythonREPLTool
+from column_index import ColumnIndex
+from pitch_data import PitchDataLoader
+from pitch_aggregates import PitchAggregates
+from tools import SmartPythonREPLTool, SQLQueryTool
+from sandbox import SandboxPool
+from llms import get_chat_llm
 
 # ------------------ Overview ------------------ #
 # This script defines a SoftballAnalysisAgent class that uses an LLM to analyze softball data.
@@ -16,64 +22,161 @@ from tools import SmartPythonREPLTool
 # Load environment variables
 load_dotenv()
 
+class AgentEventHandler(BaseCallbackHandler):
+    """Forwards agent callbacks (answer tokens, tool calls) to a queue as UI events"""
+
+    def __init__(self, events: queue.Queue):
+        self.events = events
+
+    def on_llm_new_token(self, token: str, **kwargs: Any):
+        # Tool-call chunks arrive with empty text content
+        if token:
+            self.events.put({"type": "token", "content": token})
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any):
+        self.events.put({"type": "tool_start", "tool": (serialized or {}).get("name"), "content": input_str})
+
+    def on_tool_end(self, output: Any, **kwargs: Any):
+        self.events.put({"type": "tool_end", "content": str(output)})
+
 class SoftballAnalysisAgent:
     def __init__(self, 
                  db_path: str = "structured/sqllite_db.db", 
                  table_name: str = "yakkertech",
                  vector_db_path: str = "unstructured/vectordb",
-                 collection_name: str = "data_dictionary"):
+                 collection_name: str = "data_dictionary",
+                 lazy_columns: bool = True,
+                 sandbox_workers: int = 0):
         self.db_path = db_path
         self.table_name = table_name
         self.collection_name = collection_name
+        self.lazy_columns = lazy_columns
         self.vector_db = VectorDBQuerier(db_path=vector_db_path)
+        self._column_index = None
+        self.loader = PitchDataLoader(self.db_path, self.table_name)
+        self.aggregates = PitchAggregates(self.db_path, self.table_name)
         self.df = self._load_data()
+        self.summaries = self.aggregates.load()
+        # Same client (and connection pool) as the router; answer tokens are streamed per call
+        self.llm = get_chat_llm()
+        # With sandbox_workers > 0, agent code runs in worker processes instead of this one
+        self.sandbox = SandboxPool(size=sandbox_workers) if sandbox_workers > 0 else None
+        if self.sandbox:
+            self.sandbox.publish(self.db_path, self.table_name, self.summaries)
+        self.smart_tool = SmartPythonREPLTool(df=self.df, summaries=self.summaries, sandbox=self.sandbox)
+        self.sql_tool = SQLQueryTool(db_path=self.db_path)
+        self._executors = {}
         
     def _load_data(self) -> pd.DataFrame:
-        """Connect to SQLite and load data into DataFrame"""
-        with sqlite3.connect(self.db_path) as conn:
-            return pd.read_sql_query(f"SELECT * FROM {self.table_name}", conn)
+        """Load a compact DataFrame from SQLite (core columns now, the rest on first use)"""
+        return self.loader.load(lazy=self.lazy_columns)
+
+    def refresh_data(self) -> bool:
+        """Append rows that landed in SQLite since the last load; returns True if the frame changed"""
+        refreshed = self.loader.refresh(self.df)
+        changed = refreshed is not self.df
+        self.df = refreshed
+        if changed:
+            # The ingest already updated the rollup tables; re-reading them is a few hundred rows
+            self.summaries = self.aggregates.load()
+            self.smart_tool.update_data(self.df, self.summaries)
+            if self.sandbox:
+                self.sandbox.publish(self.db_path, self.table_name, self.summaries)
+        return changed
+
+    @property
+    def data_version(self) -> int:
+        """Version of the in-memory frame, bumped whenever new rows are appended"""
+        return self.df.version
+
+    def _get_column_index(self) -> ColumnIndex:
+        """Build the exact-match column index from the data dictionary on first use"""
+        if self._column_index is None:
+            try:
+                collection = self.vector_db._get_collection(self.collection_name)
+                self._column_index = ColumnIndex.from_collection(collection)
+            except Exception as e:
+                print(f"Warning: could not load data dictionary for column index ({e}), using schema names only.")
+                self._column_index = ColumnIndex()
+        return self._column_index
 
     def _get_column_descriptions(self, user_prompt: str) -> str:
-        """Query vector DB for relevant column descriptions"""
+        """Resolve explicitly named columns locally, and query vector DB for the rest of the relevant column descriptions"""
+        column_index = self._get_column_index()
+        mentioned = column_index.match(user_prompt)
+        confident = column_index.match(user_prompt, confident_only=True)
+        if mentioned and mentioned == confident:
+            # Every mention is an unambiguous identifier, a 3+ word phrase or a column letter
+            return column_index.describe(mentioned)
+
+        # Loose matches ("pitcher", "date") are kept, but the question may need other columns too
         results = self.vector_db.query(user_prompt, self.collection_name, top_n=5)
-        return "\n".join([column['document'] for column in results])
-
-    def _setup_agent(self, system_message: str) -> AgentExecutor:
-        """Set up the LLM agent with tools and prompt template"""
-        llm = ChatOpenAI(
-            temperature=0,
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-
-        smart_tool = SmartPythonREPLTool(df=self.df)
-        tools = [smart_tool]
-
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", system_message),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad"),
-        ])
-
-        agent = create_openai_tools_agent(llm, tools, prompt_template)
-        return AgentExecutor(agent=agent, tools=tools, verbose=False)
-
-    def process_prompt(self, user_prompt: str, system_message: str, chat_history: list) -> tuple[str, list]:
-        """Process user prompt and return response with updated chat history"""
+        lines = column_index.describe(mentioned).split("\n") if mentioned else []
+        lines += [column['document'] for column in results if column['document'] not in lines]
+        return "\n".join(lines)
+
+    def _setup_agent(self, prompt_type: str = "analysis") -> AgentExecutor:
+        """Return the agent executor for a prompt type, building it on first use"""
+        if prompt_type not in self._executors:
+            tools = [self.smart_tool, self.sql_tool]
+
+            # The system message is a runtime variable so one executor serves every prompt
+            prompt_template = ChatPromptTemplate.from_messages([
+                ("system", "{system_message}"),
+                MessagesPlaceholder(variable_name="chat_history"),
+                ("human", "{input}"),
+                MessagesPlaceholder(variable_name="agent_scratchpad"),
+            ])
+
+            agent = create_openai_tools_agent(self.llm.bind(stream=True), tools, prompt_template)
+            self._executors[prompt_type] = AgentExecutor(agent=agent, tools=tools, verbose=False)
+        return self._executors[prompt_type]
+
+    def stream_prompt(self, user_prompt: str, system_message: str, chat_history: list,
+                      prompt_type: str = "analysis", refresh: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Run the agent and yield events as they happen: "token" (answer text), "tool_start" and
+        "tool_end", then a final "final" event with the answer and updated chat history.
+        Pass refresh=False when the caller already refreshed the data for this prompt.
+        """
         
-        # Setup and run agent
-        agent_executor = self._setup_agent(system_message)
-        response = agent_executor.invoke({
-            "input": user_prompt,
-            "chat_history": chat_history
-        })
+        # Pick up any newly ingested games before answering
+        if refresh:
+            self.refresh_data()
+
+        # Run the long-lived agent for this prompt type on a thread; callbacks feed the queue
+        events: queue.Queue = queue.Queue()
+        outcome = {}
+
+        def run_agent():
+            try:
+                outcome["response"] = self._setup_agent(prompt_type).invoke(
+                    {"system_message": system_message, "input": user_prompt, "chat_history": chat_history},
+                    config={"callbacks": [AgentEventHandler(events)]}
+                )
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                events.put(None)
+
+        threading.Thread(target=run_agent, daemon=True).start()
+        while (event := events.get()) is not None:
+            yield event
+        if "error" in outcome:
+            raise outcome["error"]
 
         # Update chat history
+        answer = outcome["response"]["output"]
         chat_history.append({"role": "user", "content": user_prompt})
-        chat_history.append({"role": "assistant", "content": response["output"]})
-        
-        return response["output"], chat_history
+        chat_history.append({"role": "assistant", "content": answer})
+        yield {"type": "final", "content": answer, "chat_history": chat_history}
+
+    def process_prompt(self, user_prompt: str, system_message: str, chat_history: list,
+                       prompt_type: str = "analysis") -> tuple[str, list]:
+        """Process user prompt and return response with updated chat history"""
+        for event in self.stream_prompt(user_prompt, system_message, chat_history, prompt_type):
+            if event["type"] == "final":
+                return event["content"], event["chat_history"]
 
 # def python_agent(user_prompt: str, system_prompt: str, chat_history: list, 
 #                 db_path: str = "structured/sqllite_db.db", table_name: str = "yakkertech") -> tuple[str, list]:
@@ -1,21 +1,179 @@
 import chromadb
 from chromadb.config import Settings
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from llms import embedder_chunk
+from numpy_index import NumpyVectorIndex
+from lexical_index import BM25Index, RuleNumberIndex, reciprocal_rank_fusion
+from create_vector_db import SYNC_GENERATION_KEY
 import logging
+import re
+import threading
+import time
+
+# Text collections where BM25 and rule-number lookups are fused with the vector results
+HYBRID_COLLECTIONS = ("rules", "coaching_videos")
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_size: int = 512, ttl_seconds: Optional[float] = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case-fold, collapse whitespace and drop trailing punctuation so near-identical prompts share a key"""
+        text = re.sub(r"\s+", " ", text.strip().lower())
+        return text.rstrip("?!. ")
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Return a cached query embedding, or None on a miss or expired entry"""
+        key = (model, self.normalize(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, text: str, model: str, embedding: List[float]):
+        """Store a query embedding, evicting the least recently used entry when full"""
+        key = (model, self.normalize(text))
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries)
+        }
+
 
 class VectorDBQuerier:
-    def __init__(self, db_path: str = "unstructured/vectordb"):
+    def __init__(self, db_path: str = "unstructured/vectordb",
+                 embedding_model: str = "text-embedding-3-large",
+                 query_cache: Optional[QueryEmbeddingCache] = None,
+                 small_collection_threshold: int = 5000,
+                 first_pass_dims: Optional[int] = None,
+                 quantization: Optional[str] = None,
+                 rerank_factor: int = 4,
+                 hybrid_collections: tuple = HYBRID_COLLECTIONS):
         self.db_path = db_path
+        self.embedding_model = embedding_model
+        self.query_cache = query_cache or QueryEmbeddingCache()
+        # Collections at or below this size are searched in-process with NumPy (0 disables)
+        self.small_collection_threshold = small_collection_threshold
+        # Optional compressed first pass (truncated and/or quantized) with exact re-rank, see numpy_index.py
+        self.index_options = {
+            "first_pass_dims": first_pass_dims,
+            "quantization": quantization,
+            "rerank_factor": rerank_factor
+        }
+        self.hybrid_collections = hybrid_collections
         self.client = self._get_client()
+        self._collections: Dict[str, Any] = {}
+        self._numpy_indexes: Dict[str, Optional[NumpyVectorIndex]] = {}
+        self._lexical_indexes: Dict[str, tuple] = {}
+        # (count, sync generation) each collection had when its indexes were built
+        self._index_fingerprints: Dict[str, tuple] = {}
 
     def _get_client(self) -> chromadb.PersistentClient:
         """Create and return a ChromaDB client"""
         return chromadb.PersistentClient(path=self.db_path)
 
     def _get_collection(self, collection_name: str) -> Any:
-        """Get a collection from the vector database"""
-        return self.client.get_collection(name=collection_name)
+        """Get a collection from the vector database, reusing the handle after the first lookup"""
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = self.client.get_collection(name=collection_name)
+            self._collections[collection_name] = collection
+        return collection
+
+    def _get_numpy_index(self, collection_name: str, collection: Any) -> Optional[NumpyVectorIndex]:
+        """Build (once) an in-process index for small collections, or None to use Chroma"""
+        if collection_name not in self._numpy_indexes:
+            index = None
+            if 0 < collection.count() <= self.small_collection_threshold:
+                index = NumpyVectorIndex.from_collection(collection, **self.index_options)
+                if not index.matches_chroma(collection):
+                    logging.warning(f"NumPy index for '{collection_name}' disagrees with Chroma; using Chroma")
+                    index = None
+            self._numpy_indexes[collection_name] = index
+        return self._numpy_indexes[collection_name]
+
+    def refresh_backends(self):
+        """Forget cached collection handles and in-process indexes (call after the vector DB is synced)"""
+        self._collections.clear()
+        self._numpy_indexes.clear()
+        self._lexical_indexes.clear()
+        self._index_fingerprints.clear()
+
+    def _current_collection(self, collection_name: str) -> Any:
+        """
+        Return the collection handle, first dropping the NumPy, BM25 and rule-number indexes if the
+        collection was synced or recreated since they were built. The fingerprint is the collection
+        id, its size and the generation create_vector_db stamps on every sync (read fresh, ~1 ms).
+        """
+        collection = self.client.get_collection(name=collection_name)
+        fingerprint = (collection.id, collection.count(), (collection.metadata or {}).get(SYNC_GENERATION_KEY))
+        if self._index_fingerprints.get(collection_name, fingerprint) != fingerprint:
+            logging.info(f"Collection '{collection_name}' was synced; rebuilding in-process indexes")
+            self._numpy_indexes.pop(collection_name, None)
+            self._lexical_indexes.pop(collection_name, None)
+        self._index_fingerprints[collection_name] = fingerprint
+        # A rebuild recreates the collection under a new id; keep the fresh handle
+        self._collections[collection_name] = collection
+        return collection
+
+    def _get_lexical_indexes(self, collection_name: str) -> tuple:
+        """Build (once) the BM25 index and rule-number table for a text collection"""
+        if collection_name not in self._lexical_indexes:
+            collection = self._get_collection(collection_name)
+            self._lexical_indexes[collection_name] = (
+                BM25Index.from_collection(collection),
+                RuleNumberIndex.from_collection(collection)
+            )
+        return self._lexical_indexes[collection_name]
+
+    def _fuse(self, query: str, collection_name: str, vector_results: List[Dict], top_n: int) -> List[Dict]:
+        """Put exact rule-number hits first, then fuse BM25 and vector rankings with RRF"""
+        bm25, rules = self._get_lexical_indexes(collection_name)
+        rule_hits = [{**hit, "distance": 0.0} for hit in rules.lookup(query)]
+        keyword_results = bm25.search(query, top_n * 2)
+
+        # Lexical-only hits get the worst vector distance seen so distances stay comparable
+        fallback_distance = max((result["distance"] for result in vector_results), default=0.0)
+        fused = reciprocal_rank_fusion([vector_results, keyword_results])
+        for result in fused:
+            result.setdefault("distance", fallback_distance)
+
+        seen = {hit["id"] for hit in rule_hits}
+        return (rule_hits + [result for result in fused if result["id"] not in seen])[:top_n]
+
+    def _embed_query(self, query: str) -> List[float]:
+        """Embed a query, skipping the network round trip for recently seen prompts"""
+        embedding = self.query_cache.get(query, self.embedding_model)
+        if embedding is None:
+            embedding = embedder_chunk(query, model=self.embedding_model)
+            self.query_cache.put(query, self.embedding_model, embedding)
+        return embedding
 
     def _execute_query(self, collection: Any, query_embedding: List[float], top_n: int) -> Dict:
         """Execute the query against the vector database"""
@@ -28,22 +186,113 @@ class VectorDBQuerier:
     def _process_results(self, results: Dict) -> List[Dict]:
         """Process and combine query results into a list of dictionaries"""
         return [{
+            "id": results["ids"][0][i],
             "document": results["documents"][0][i],
             "metadata": results["metadatas"][0][i],
             "distance": results["distances"][0][i]
         } for i in range(len(results["documents"][0]))]
 
+    def _search(self, collection_name: str, query_embedding: List[float], top_n: int,
+                query_text: Optional[str] = None) -> List[Dict]:
+        """Search one collection with an already computed query embedding (hybrid when query_text is given)"""
+        try:
+            hybrid = query_text is not None and collection_name in self.hybrid_collections
+            # Pull a deeper vector list when it will be fused with keyword results
+            depth = top_n * 2 if hybrid else top_n
+            collection = self._current_collection(collection_name)
+            index = self._get_numpy_index(collection_name, collection)
+            if index is not None:
+                results = index.search(query_embedding, depth)
+            else:
+                results = self._process_results(self._execute_query(collection, query_embedding, depth))
+            return self._fuse(query_text, collection_name, results, top_n) if hybrid else results
+        except Exception:
+            # Drop the cached handle in case the collection was recreated underneath us
+            self._collections.pop(collection_name, None)
+            self._numpy_indexes.pop(collection_name, None)
+            self._lexical_indexes.pop(collection_name, None)
+            self._index_fingerprints.pop(collection_name, None)
+            raise
+
+    def _rule_lookup(self, query: str, collection_name: str, top_n: int) -> Optional[List[Dict]]:
+        """Answer "rule 6.4"-style queries from the lookup table without embedding, or None"""
+        if collection_name not in self.hybrid_collections or not RuleNumberIndex.is_lookup(query):
+            return None
+        try:
+            self._current_collection(collection_name)
+            bm25, rules = self._get_lexical_indexes(collection_name)
+        except Exception:
+            self._collections.pop(collection_name, None)
+            self._lexical_indexes.pop(collection_name, None)
+            self._index_fingerprints.pop(collection_name, None)
+            raise
+        hits = rules.lookup(query)
+        if not hits:
+            return None
+        results = [{**hit, "distance": 0.0} for hit in hits]
+        seen = {hit["id"] for hit in hits}
+        for result in bm25.search(query, top_n):
+            if len(results) >= top_n:
+                break
+            if result["id"] not in seen:
+                results.append({**result, "distance": 1.0})
+        return results[:top_n]
+
+    @staticmethod
+    def _normalize_distances(results: List[Dict]) -> List[Dict]:
+        """Min-max scale distances within one collection so results from different collections are comparable"""
+        if not results:
+            return results
+        distances = [result["distance"] for result in results]
+        low, high = min(distances), max(distances)
+        spread = high - low
+        for result in results:
+            result["normalized_distance"] = (result["distance"] - low) / spread if spread > 0 else 0.0
+        return results
+
     def query(self, query: str, collection_name: str, top_n: int = 5) -> List[Dict]:
         """Main function to query the vector database"""
         try:
-            collection = self._get_collection(collection_name)
-            query_embedding = embedder_chunk(query)
-            results = self._execute_query(collection, query_embedding, top_n)
-            return self._process_results(results)
+            results = self._rule_lookup(query, collection_name, top_n)
+            if results is not None:
+                return results
+            query_embedding = self._embed_query(query)
+            return self._search(collection_name, query_embedding, top_n, query_text=query)
         except Exception as e:
             logging.error(f"Error querying Vector DB: {str(e)}")
             raise
 
+    def query_many(self, query: str, collection_names: List[str], top_n: int = 5,
+                   merged_top_n: Optional[int] = None) -> List[Dict]:
+        """
+        Embed the query once and search several collections in parallel.
+
+        Each collection contributes at most `top_n` results. Distances are normalized
+        per collection before merging, and every result is tagged with its collection.
+        Returns the merged list sorted best-first, truncated to `merged_top_n` if given.
+        """
+        try:
+            query_embedding = self._embed_query(query)
+            with ThreadPoolExecutor(max_workers=max(1, len(collection_names))) as executor:
+                searches = executor.map(
+                    lambda name: self._search(name, query_embedding, top_n, query_text=query), collection_names
+                )
+                merged = []
+                for collection_name, results in zip(collection_names, searches):
+                    for result in self._normalize_distances(results):
+                        result["collection"] = collection_name
+                        merged.append(result)
+        except Exception as e:
+            logging.error(f"Error querying Vector DB: {str(e)}")
+            raise
+
+        merged.sort(key=lambda result: (result["normalized_distance"], result["distance"]))
+        return merged[:merged_top_n] if merged_top_n is not None else merged
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return query-embedding cache hit/miss counters"""
+        return self.query_cache.stats()
+
 # def query_vector_db(query: str, collection_name: str, top_n: int = 5) -> List[Dict]:
 #     """Convenience function to query the vector database"""
 #     querier = VectorDBQuerier()
@@ -1,24 +1,84 @@
 from python_agent import SoftballAnalysisAgent
-from langchain_openai import ChatOpenAI
-import os
+from pitch_aggregates import SUMMARY_DESCRIPTION
+from prompt_classifier import LocalPromptClassifier
+from answer_cache import SemanticAnswerCache
+from llms import get_chat_llm
+from pydantic import BaseModel, Field
+import time
+import uuid
+import shutil
+import asyncio
 from pathlib import Path
-from typing import Tuple, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Literal, Tuple, List, Optional
+
+class RoutingDecision(BaseModel):
+    relevant: bool = Field(description="Whether the prompt is softball-related")
+    prompt_type: Literal["analysis", "visualization"] = Field(description="Which agent should answer")
 
 class PromptRouter:
     def __init__(self):
-        self.llm = ChatOpenAI(
-            temperature=0,
-            model="gpt-4o-mini",  # fast and cheap
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        self.llm = get_chat_llm("gpt-4o-mini")  # fast and cheap, shared with the agent
+        self.routing_llm = self.llm.with_structured_output(RoutingDecision)
         self.viz_dir = Path('visualizations')
         self.viz_dir.mkdir(exist_ok=True)
 
         # ✅ Initialize the SoftballAnalysisAgent once here
         self.analysis_agent = SoftballAnalysisAgent(
             db_path="structured/sqllite_db.db",
-            table_name="yakkertech"
+            table_name="yakkertech",
+            sandbox_workers=2  # agent code runs in isolated worker processes
         )
+        self._local_classifier = None
+        self._classifier_data_version = None
+        self.routing_stats = {"prompts": 0, "fast_path": 0, "total_ms": 0.0}
+        self.answer_cache = SemanticAnswerCache()
+        self.cached_plot_dir = self.viz_dir / "cache"
+        self.cached_plot_dir.mkdir(exist_ok=True)
+        # Owned by the router so asyncio.run never waits on it: an abandoned stage just finishes here
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="router")
+
+    def _get_local_classifier(self) -> LocalPromptClassifier:
+        """Build the keyword/centroid classifier with player and column names from the data"""
+        if self._local_classifier is None:
+            self._local_classifier = LocalPromptClassifier(
+                embed=self.analysis_agent.vector_db._embed_query,
+                embedding_model=self.analysis_agent.vector_db.embedding_model
+            )
+        if self._classifier_data_version != self.analysis_agent.data_version:
+            # Pick up players from newly ingested games
+            summaries = self.analysis_agent.summaries
+            names = list(summaries["pitcher_summary"]["Pitcher"]) + list(summaries["batter_summary"]["Batter"])
+            self._local_classifier.update_vocabulary(names, self.analysis_agent.df.all_columns)
+            self._classifier_data_version = self.analysis_agent.data_version
+        return self._local_classifier
+
+    def _classify_with_llm(self, user_prompt: str) -> Dict:
+        """Decide relevance and prompt type in a single structured LLM call."""
+        routing_prompt = f"""
+        You are routing a user's prompt for a softball analytics assistant.
+
+        relevant: true if the prompt is about softball analytics, statistics, rules, databases, players,
+        games, coaching or visualizations; false otherwise.
+        prompt_type: "visualization" if the user wants a plot or chart, otherwise "analysis".
+
+        Prompt: {user_prompt}
+        """
+
+        try:
+            decision = self.routing_llm.invoke(routing_prompt)
+            return {"relevant": decision.relevant, "prompt_type": decision.prompt_type, "source": "llm"}
+        except Exception as e:
+            print(f"Warning: Structured routing call failed ({e}), falling back to plain routing calls.")
+
+        # A failure must never admit a prompt unchecked: plain yes/no calls, else reject
+        try:
+            if not self._check_relevance(user_prompt):
+                return {"relevant": False, "prompt_type": None, "source": "llm"}
+            return {"relevant": True, "prompt_type": self._classify_prompt(user_prompt), "source": "llm"}
+        except Exception as e:
+            print(f"Warning: Routing failed ({e}), rejecting the prompt.")
+            return {"relevant": False, "prompt_type": None, "source": "llm"}
 
     def _check_relevance(self, user_prompt: str) -> bool:
         """Determine if the prompt is relevant (softball-related)."""
@@ -59,12 +119,36 @@ class PromptRouter:
             classification = "analysis"
 
         return classification
-    
-    def _build_system_prompt(self, user_prompt: str, prompt_type: str) -> str:
+
+    def _classify(self, user_prompt: str) -> Dict:
+        """Route locally when confident, otherwise with one LLM call; records latency and hit rate"""
+        start = time.perf_counter()
+        decision = self._get_local_classifier().classify(user_prompt) or self._classify_with_llm(user_prompt)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.routing_stats["prompts"] += 1
+        self.routing_stats["fast_path"] += decision["source"] != "llm"
+        self.routing_stats["total_ms"] += elapsed_ms
+        print(f"🧭 Routed via {decision['source']} in {elapsed_ms:.1f} ms "
+              f"(fast path {self.routing_report()['fast_path_rate']:.0%} of {self.routing_stats['prompts']} prompts)")
+        return decision
+
+    def routing_report(self) -> Dict:
+        """Routing counters: prompts seen, fast-path hit rate and mean routing latency"""
+        prompts = self.routing_stats["prompts"]
+        return {
+            **self.routing_stats,
+            "fast_path_rate": self.routing_stats["fast_path"] / prompts if prompts else 0.0,
+            "mean_ms": self.routing_stats["total_ms"] / prompts if prompts else 0.0,
+        }
+
+    def _build_system_prompt(self, user_prompt: str, prompt_type: str,
+                             column_descriptions: Optional[str] = None) -> str:
         """Build the full system prompt based on prompt type"""
         
-        # Get column descriptions first
-        column_descriptions = self.analysis_agent._get_column_descriptions(user_prompt)
+        # Get column descriptions first (unless the routing pipeline already fetched them)
+        if column_descriptions is None:
+            column_descriptions = self.analysis_agent._get_column_descriptions(user_prompt)
         
         if prompt_type == "analysis":
             return f"""You are a helpful assistant that can analyze softball data using Python.
@@ -73,7 +157,11 @@ class PromptRouter:
             Here are relevant column descriptions to help you understand the data:
             {column_descriptions}
 
+            {SUMMARY_DESCRIPTION}
+
             Use these descriptions to choose the correct columns when analyzing the data.
+            For filters and aggregations (by Pitcher, Batter, GameID, Date, ...) prefer the read-only
+            'sql_query' tool over loading rows into pandas.
             Answer clearly and concisely."""
         
         elif prompt_type == "visualization":
@@ -83,6 +171,8 @@ class PromptRouter:
             Here are relevant column descriptions to help you understand the data:
             {column_descriptions}
 
+            {SUMMARY_DESCRIPTION}
+
             When creating a plot, always save the figure using plt.savefig('visualizations/plot.png').
             """
 
@@ -98,35 +188,130 @@ class PromptRouter:
             return str(max(new_images, key=lambda p: p.stat().st_ctime))
         return None
 
-    def route(self, user_prompt: str, chat_history: List) -> Tuple[str, List, Optional[str]]:
-        """Route user prompt to appropriate agent and handle visualization."""
+    async def _timed(self, timings: Dict[str, float], stage: str, func, *args):
+        """Run a blocking stage on the router's thread pool and record its wall time"""
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            timings[stage] = (time.perf_counter() - start) * 1000
 
-        # Check if prompt is relevant
-        is_relevant = self._check_relevance(user_prompt)
-        if not is_relevant:
-            return "Sorry, I can only help with softball-related questions.", chat_history, None
+    async def _prepare(self, user_prompt: str) -> Tuple[Dict, Optional[str], Dict[str, float]]:
+        """
+        Run routing and column retrieval concurrently. Column retrieval doesn't depend on the
+        routing decision, so it starts speculatively and is abandoned when the prompt turns out
+        to be irrelevant; the reply doesn't wait for it.
+        """
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        routing = asyncio.create_task(self._timed(timings, "routing", self._classify, user_prompt))
+        columns = asyncio.create_task(self._timed(
+            timings, "columns", self.analysis_agent._get_column_descriptions, user_prompt))
+
+        decision = await routing
+        if not decision["relevant"]:
+            # Not started yet: never runs. Already running: finishes on the pool, result dropped
+            columns.cancel()
+            timings["total"] = (time.perf_counter() - start) * 1000
+            return decision, None, timings
+
+        column_descriptions = await columns
+        timings["total"] = (time.perf_counter() - start) * 1000
+        return decision, column_descriptions, timings
+
+    def _lookup_cached_answer(self, user_prompt: str, chat_history: List) -> Tuple[Optional[Dict], Optional[List[float]]]:
+        """Look the prompt up in the answer cache for the current data version"""
+        if chat_history:
+            # Follow-ups ("what about in game 2?") depend on the conversation, not just their words
+            return None, None
+        try:
+            embedding = self.analysis_agent.vector_db._embed_query(user_prompt)
+        except Exception as e:
+            print(f"Warning: could not embed prompt for the answer cache ({e}).")
+            return None, None
+
+        # Narrow to a prompt type when the local classifier is sure (reuses the cached embedding)
+        local = self._get_local_classifier().classify(user_prompt)
+        prompt_type = local["prompt_type"] if local else None
+        return self.answer_cache.get(embedding, self.analysis_agent.data_version, prompt_type), embedding
+
+    def _cache_answer(self, user_prompt: str, embedding: Optional[List[float]], prompt_type: str,
+                      answer: str, plot: Optional[str]):
+        """Store an answer; plots are copied because the agent overwrites its output file"""
+        if embedding is None:
+            return
+        if plot:
+            cached_plot = self.cached_plot_dir / f"{uuid.uuid4().hex}.png"
+            shutil.copyfile(plot, cached_plot)
+            plot = str(cached_plot)
+        self.answer_cache.put(user_prompt, embedding, prompt_type, self.analysis_agent.data_version, answer, plot)
+
+    def stream_route(self, user_prompt: str, chat_history: List) -> Iterator[Dict]:
+        """
+        Route a prompt and yield progress as it happens: "status" updates, the agent's "token",
+        "tool_start" and "tool_end" events, and a last "final" event with the answer, the
+        updated chat history and an optional plot path.
+        """
+        yield {"type": "status", "content": "Checking for a recent answer..."}
+
+        # The one data refresh per prompt: new games bump the version, which invalidates the cache
+        self.analysis_agent.refresh_data()
+
+        # Repeated questions on unchanged data are answered from the semantic cache
+        start = time.perf_counter()
+        cached, embedding = self._lookup_cached_answer(user_prompt, chat_history)
+        if cached:
+            print(f"⚡ Answer cache hit ({cached['similarity']:.3f} similar to \"{cached['prompt']}\") "
+                  f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+            chat_history.append({"role": "user", "content": user_prompt})
+            chat_history.append({"role": "assistant", "content": cached["answer"]})
+            yield {"type": "final", "content": cached["answer"], "chat_history": chat_history, "plot": cached["plot"]}
+            return
+
+        # Relevance/classification and column retrieval overlap
+        yield {"type": "status", "content": "Routing and looking up relevant columns..."}
+        decision, column_descriptions, timings = asyncio.run(self._prepare(user_prompt))
+        print("⏱️  " + ", ".join(f"{stage} {ms:.0f} ms" for stage, ms in timings.items()))
+        if not decision["relevant"]:
+            answer = "Sorry, I can only help with softball-related questions."
+            yield {"type": "final", "content": answer, "chat_history": chat_history, "plot": None}
+            return
         
-        # Classify prompt type
-        prompt_type = self._classify_prompt(user_prompt)
+        prompt_type = decision["prompt_type"]
         print(f"Routing to: {prompt_type.upper()} agent ✈️")
+        yield {"type": "status", "content": f"Working on it with the {prompt_type} agent..."}
 
         # Build system prompt
-        system_prompt = self._build_system_prompt(user_prompt, prompt_type)
+        system_prompt = self._build_system_prompt(user_prompt, prompt_type, column_descriptions)
 
         # Track existing visualizations
         existing_images = set(self.viz_dir.glob('*.png'))
 
-        # Get response from agent
-        answer, updated_chat_history = self.analysis_agent.process_prompt(
+        # Stream the agent's tool calls and answer tokens through
+        answer, updated_chat_history = None, chat_history
+        for event in self.analysis_agent.stream_prompt(
             user_prompt=user_prompt,
-            system_prompt=system_prompt,
-            chat_history=chat_history
-        )
+            system_message=system_prompt,
+            chat_history=chat_history,
+            prompt_type=prompt_type,
+            refresh=False  # already refreshed above
+        ):
+            if event["type"] == "final":
+                answer, updated_chat_history = event["content"], event["chat_history"]
+            else:
+                yield event
 
         # Check for new visualization
         optional_plot = self._get_new_visualization(existing_images)
+        self._cache_answer(user_prompt, embedding, prompt_type, answer, optional_plot)
+
+        yield {"type": "final", "content": answer, "chat_history": updated_chat_history, "plot": optional_plot}
 
-        return answer, updated_chat_history, optional_plot
+    def route(self, user_prompt: str, chat_history: List) -> Tuple[str, List, Optional[str]]:
+        """Route user prompt to appropriate agent and handle visualization."""
+        for event in self.stream_route(user_prompt, chat_history):
+            if event["type"] == "final":
+                return event["content"], event["chat_history"], event["plot"]
 
 # # Initialize global router
 # router = PromptRouter()
@@ -0,0 +1,239 @@
+import io
+import os
+import math
+import atexit
+import queue
+import signal
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict, Optional
+from pitch_snapshot import PitchSnapshot
+
+# ------------------ Overview ------------------ #
+# This module runs agent-written Python in a pool of pre-warmed worker processes instead of
+# the Streamlit server process.
+# - Data is published once, not pickled per call: the pitch table is written as an Arrow
+#   snapshot in shared memory (/dev/shm) and the summary frames as Feather files. Each worker
+#   reads them into its own compact LazyPitchFrame (a private copy, so N workers hold N frames)
+#   and reloads only when the data token changes.
+# - Every call gets a CPU-time limit (RLIMIT_CPU) and a wall-clock timeout. The address-space
+#   cap (RLIMIT_AS) is set after the data is loaded, to the worker's current size plus
+#   memory_limit_mb, so the budget is what a snippet may allocate on top of its copy of the data.
+#   A worker that times out, crashes or runs out of memory is killed and replaced, and workers
+#   are recycled after max_tasks calls.
+# - Each caller checks out its own worker, so several analysis requests run in parallel.
+
+SHARED_DIR = Path("/dev/shm") if os.path.isdir("/dev/shm") else Path(tempfile.gettempdir())
+
+
+def execute_snippet(command: str, exec_globals: Dict[str, Any]) -> str:
+    """
+    Execute a snippet the way the Python tool always has: every line but the last is executed,
+    the last line is evaluated, and printed output plus the result are returned as text.
+    """
+    buffer = io.StringIO()
+    # Empty dict for local variables created during execution
+    exec_locals = {}
+
+    # Body can have multiple lines, last line is treated as expression to evaluate
+    lines = command.strip().split("\n")
+    *body, last = lines if len(lines) > 1 else ("", lines[0])
+    body_code = "\n".join(body)
+
+    # Redirect stdout to capture printed output
+    with contextlib.redirect_stdout(buffer):
+        if body_code.strip():
+            exec(body_code, exec_globals, exec_locals)
+        result = eval(last, exec_globals, exec_locals)
+
+    # Combine printed output and evaluation result
+    final_output = buffer.getvalue().strip()
+    if result is not None:
+        final_output += "\n" + str(result)
+    return final_output.strip()
+
+
+# ------------------ Worker process ------------------ #
+class _CPUTimeExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CPUTimeExceeded()
+
+
+def _address_space_bytes() -> int:
+    """Current virtual memory size of this process (Linux /proc)"""
+    import resource
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[0]) * resource.getpagesize()
+
+
+def _worker_main(conn, memory_limit_mb: Optional[int]):
+    """Worker loop: import the data stack once, then execute snippets sent over the pipe"""
+    import resource
+    import numpy as np
+    import pandas as pd
+    from pitch_data import PitchDataLoader
+
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+    data_token, namespace = None, {}
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        command, data, cpu_seconds = message
+
+        try:
+            if data["token"] != data_token:
+                # New data was published: lift the cap, load this worker's copy, then cap again
+                _, hard = resource.getrlimit(resource.RLIMIT_AS)
+                resource.setrlimit(resource.RLIMIT_AS, (hard, hard))
+                namespace = {}
+                loader = PitchDataLoader(data["db_path"], data["table_name"], snapshot_path=data["snapshot_path"])
+                namespace = {"df": loader.load(lazy=True)}
+                namespace.update({name: pd.read_feather(path) for name, path in data["frames"].items()})
+                data_token = data["token"]
+                if memory_limit_mb:
+                    limit = _address_space_bytes() + memory_limit_mb * 1024 * 1024
+                    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+            df = namespace["df"]
+            df.load_columns_for(command)
+
+            # Soft CPU limit relative to what this worker has used so far
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            spent = math.ceil(used.ru_utime + used.ru_stime)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (spent + cpu_seconds, hard))
+
+            exec_globals = {"pd": pd, "np": np, **namespace}
+            conn.send(("ok", execute_snippet(command, exec_globals)))
+        except _CPUTimeExceeded:
+            conn.send(("recycle", f"Error executing Python code: exceeded the {cpu_seconds}s CPU time limit"))
+        except MemoryError:
+            conn.send(("recycle", "Error executing Python code: exceeded the worker memory limit"))
+        except Exception as e:
+            conn.send(("ok", f"Error executing Python code: {e}"))
+        finally:
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+class SandboxWorker:
+    def __init__(self, context, memory_limit_mb: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_limit_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def run(self, command: str, data: Dict[str, Any], cpu_seconds: int, timeout_seconds: float) -> tuple:
+        """Send one snippet and wait for its output; ("timeout", ...) when the deadline passes"""
+        self.tasks += 1
+        try:
+            self.conn.send((command, data, cpu_seconds))
+            if not self.conn.poll(timeout_seconds):
+                return "timeout", f"Error executing Python code: exceeded the {timeout_seconds:g}s time limit"
+            return self.conn.recv()
+        except (EOFError, OSError):
+            return "crashed", "Error executing Python code: the worker process exited (out of memory?)"
+
+    def stop(self):
+        """Ask the worker to exit, killing it if it doesn't"""
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+# ------------------ Pool ------------------ #
+class SandboxPool:
+    def __init__(self, size: int = 2, timeout_seconds: float = 30.0, cpu_seconds: int = 20,
+                 memory_limit_mb: Optional[int] = 2048, max_tasks: int = 100):
+        self.size = size
+        self.timeout_seconds = timeout_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks = max_tasks
+        # Workers re-import the data stack instead of inheriting the server's threads and sockets
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[SandboxWorker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._token = 0
+        self.stats = {"calls": 0, "timeouts": 0, "recycled": 0}
+
+        os.environ.setdefault("MPLBACKEND", "Agg")
+        os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+        for _ in range(size):
+            self._idle.put(self._start_worker())
+        atexit.register(self.close)
+        print(f"🧪 Started {size} sandbox workers")
+
+    def _start_worker(self) -> SandboxWorker:
+        return SandboxWorker(self._context, self.memory_limit_mb)
+
+    def publish(self, db_path: str, table_name: str, summaries: Optional[Dict[str, Any]] = None):
+        """Write the current pitch table and summary frames to shared memory for the workers"""
+        with self._lock:
+            self._token += 1
+            prefix = SHARED_DIR / f"softball_{os.getpid()}"
+            snapshot = PitchSnapshot(db_path, table_name, snapshot_path=f"{prefix}_{table_name}.arrow")
+            snapshot.refresh()
+            frames = {}
+            for name, frame in (summaries or {}).items():
+                path = f"{prefix}_{name}_{self._token}.feather"
+                frame.reset_index(drop=True).to_feather(path)
+                frames[name] = path
+            previous = self._data
+            self._data = {
+                "token": self._token,
+                "db_path": str(Path(db_path).resolve()),
+                "table_name": table_name,
+                "snapshot_path": str(snapshot.snapshot_path),
+                "frames": frames,
+            }
+        # Workers pick up the new files on their next call; old summary files are no longer needed
+        for path in (previous or {}).get("frames", {}).values():
+            Path(path).unlink(missing_ok=True)
+
+    def run(self, command: str) -> str:
+        """Execute a snippet on the next free worker"""
+        if self._data is None:
+            return "Error executing Python code: no data has been published to the sandbox."
+        worker = self._idle.get()
+        status = "crashed"
+        try:
+            status, output = worker.run(command, self._data, self.cpu_seconds, self.timeout_seconds)
+            return output
+        finally:
+            self.stats["calls"] += 1
+            self.stats["timeouts"] += status == "timeout"
+            if status != "ok" or worker.tasks >= self.max_tasks or not worker.process.is_alive():
+                # Replace the worker: its state (or the process itself) can't be trusted anymore
+                self.stats["recycled"] += 1
+                worker.stop()
+                worker = self._start_worker()
+            self._idle.put(worker)
+
+    def close(self):
+        """Stop every worker and remove the shared files"""
+        while not self._idle.empty():
+            self._idle.get().stop()
+        if self._data:
+            Path(self._data["snapshot_path"]).unlink(missing_ok=True)
+            for path in self._data["frames"].values():
+                Path(path).unlink(missing_ok=True)
@@ -1,71 +1,272 @@
-import io
-import contextlib
+import re
+import ast
+import time
+import sqlite3
+import hashlib
 import pandas as pd
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Type, Union
+from pydantic import BaseModel, Field
+from langchain_core.tools import BaseTool
+from langchain_core.callbacks import CallbackManagerForToolRun
 from langchain_experimental.tools import PythonREPLTool
+from sandbox import SandboxPool, execute_snippet
+
+# ------------------ Execution cache ------------------ #
+# Memoization is opt-in: a snippet is cached only when every call it makes is on the allowlists
+# below (pure builtins and read-only pandas/numpy functions and methods) and every name it reads
+# is pd, np, an injected frame or something the snippet bound itself. Imports, unknown calls,
+# dunder access and item/attribute writes always execute.
+PURE_BUILTINS = {
+    "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float", "format", "frozenset",
+    "int", "isinstance", "len", "list", "map", "max", "min", "print", "range", "repr", "reversed",
+    "round", "set", "slice", "sorted", "str", "sum", "tuple", "zip", "True", "False", "None"
+}
+PURE_METHODS = {
+    # Constructors and top-level pandas/numpy helpers that only compute
+    "DataFrame", "Series", "Index", "Categorical", "concat", "merge", "cut", "qcut", "crosstab",
+    "pivot_table", "to_datetime", "to_numeric", "to_timedelta", "isna", "notna", "array", "asarray",
+    "arange", "linspace", "where", "select", "mean", "median", "std", "var", "percentile", "quantile",
+    "corrcoef", "histogram", "sqrt", "log", "exp", "floor", "ceil", "clip", "abs", "round", "isnan",
+    "nanmean", "nanmedian", "nanstd", "unique", "sort", "argsort", "argmax", "argmin", "polyfit",
+    "degrees", "radians", "sin", "cos", "arctan2", "hypot", "digitize", "cumsum", "diff",
+    # Read-only frame, series, groupby, string and datetime methods (inplace= is rejected separately)
+    "agg", "aggregate", "all", "any", "apply", "assign", "astype", "between", "copy", "corr", "count",
+    "cov", "cummax", "cummin", "cumprod", "describe", "drop", "drop_duplicates", "dropna", "duplicated",
+    "eq", "ewm", "expanding", "explode", "fillna", "filter", "first", "ge", "get", "get_group", "groupby",
+    "gt", "head", "idxmax", "idxmin", "isin", "isnull", "items", "iterrows", "itertuples", "join",
+    "keys", "kurt", "last", "le", "lt", "map", "mask", "max", "melt", "min", "mode", "ne", "nlargest",
+    "notnull", "nsmallest", "nunique", "pct_change", "pivot", "prod", "rank", "reindex", "rename",
+    "replace", "reset_index", "resample", "rolling", "select_dtypes", "set_index", "shift",
+    "size", "skew", "sort_index", "sort_values", "stack", "sum", "tail", "to_dict", "to_frame",
+    "to_list", "to_numpy", "to_string", "to_markdown", "tolist", "transform", "transpose", "unstack",
+    "value_counts", "values", "query", "contains", "startswith", "endswith", "lower", "upper", "strip",
+    "split", "len", "date", "year", "month", "day", "hour", "strftime",
+}
+MAX_CACHED_OUTPUT_CHARS = 100_000
+
+
+def normalize_code(code: str) -> Optional[str]:
+    """Canonical form of a snippet (comments, spacing and quote style removed); None if it doesn't parse"""
+    try:
+        return ast.unparse(ast.parse(code.strip()))
+    except SyntaxError:
+        return None
+
+
+def _bound_names(tree: ast.AST) -> set:
+    """Names the snippet assigns itself (variables, loop and comprehension targets, lambda args)"""
+    bound = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)}
+    bound.update(arg.arg for node in ast.walk(tree) if isinstance(node, ast.Lambda) for arg in node.args.args)
+    return bound
+
+
+def is_side_effect_free(code: str, protected_names: set) -> bool:
+    """True when a snippet provably only reads data (see the allowlists above); unknown means False"""
+    tree = ast.parse(code.strip())
+    known_names = PURE_BUILTINS | {"pd", "np"} | set(protected_names) | _bound_names(tree)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.Global, ast.Nonlocal, ast.Delete,
+                             ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.With, ast.Await)):
+            return False
+        # Module globals such as Path, time or sqlite3 are reachable outside the sandbox
+        if isinstance(node, ast.Name) and node.id not in known_names:
+            return False
+        if isinstance(node, ast.Attribute) and node.attr.startswith("__"):
+            return False
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id not in PURE_BUILTINS:
+                return False
+            if isinstance(node.func, ast.Attribute) and node.func.attr not in PURE_METHODS:
+                return False
+            if not isinstance(node.func, (ast.Name, ast.Attribute)):
+                return False
+        if isinstance(node, ast.keyword) and node.arg == "inplace":
+            return False
+        if isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.For)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                for part in ast.walk(target):
+                    # Any item or attribute write (d["x"] = ..., d.loc[...] = ...) may go through an
+                    # alias of an injected frame (d = df), so none of them are treated as read-only
+                    if isinstance(part, (ast.Subscript, ast.Attribute)):
+                        return False
+                    # Rebinding df or a summary frame changes what later snippets see
+                    if isinstance(part, ast.Name) and part.id in protected_names:
+                        return False
+    return True
+
 
 class SmartPythonREPLTool(PythonREPLTool):
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, summaries: Optional[Dict[str, pd.DataFrame]] = None,
+                 cache_size: int = 256, sandbox: Optional[SandboxPool] = None):
         """
-        A Python tool that executes agent-written code, with access to the provided DataFrame 'df'.
+        A Python tool that executes agent-written code, with access to the provided DataFrame 'df'
+        and any precomputed summary frames (pitcher_summary, batter_summary, ...).
+        Outputs of side-effect-free snippets are memoized per normalized code and frame version.
+        With a sandbox pool, code runs in a worker process on the data published to the pool.
         """
         super().__init__()
-        self._local_vars = {"df": df}
+        self._local_vars = {}
+        self._sandbox = sandbox
+        self._cache_size = cache_size
+        self._result_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_counters = {"hits": 0, "misses": 0, "uncacheable": 0}
+        self.update_data(df, summaries)
 
-    def run(self, command: str, **kwargs) -> str:
+    def _version_token(self) -> str:
+        """Identifies the injected frame: a refresh yields a new object with a bumped version"""
+        df = self._local_vars.get("df")
+        return f"{id(df)}:{getattr(df, 'version', 0)}"
+
+    def _cache_key(self, command: str) -> Optional[str]:
+        """Cache key for a snippet, or None when it must always execute"""
+        normalized = normalize_code(command)
+        if normalized is None or not is_side_effect_free(normalized, set(self._local_vars)):
+            self._cache_counters["uncacheable"] += 1
+            return None
+        return hashlib.sha256(f"{self._version_token()}\n{normalized}".encode()).hexdigest()
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Execution cache hit/miss counters and size"""
+        lookups = self._cache_counters["hits"] + self._cache_counters["misses"]
+        return {
+            **self._cache_counters,
+            "size": len(self._result_cache),
+            "hit_rate": self._cache_counters["hits"] / lookups if lookups else 0.0
+        }
+
+    def update_data(self, df: pd.DataFrame, summaries: Optional[Dict[str, pd.DataFrame]] = None):
+        """Point the tool at a refreshed DataFrame (the tool outlives individual prompts)"""
+        self._local_vars.update({"df": df, **(summaries or {})})
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
         """
-        Execute Python code and return both printed output and evaluated results.
+        Execute Python code (or return its memoized output) with printed output and evaluated results.
+        Implemented as _run so BaseTool.run still fires the tool start/end callbacks.
         
         Args:
-            command (str): Python code to execute
-            **kwargs: Additional keyword arguments
+            query (str): Python code to execute
+            run_manager (CallbackManagerForToolRun, optional): Callback manager supplied by BaseTool.run
             
         Returns:
             str: Combined output of printed statements and evaluated results
         """
+        command = query
         try:
             # Handle case where input is a dict with 'query' key instead of raw string
             if isinstance(command, dict) and "query" in command:
                 command = command["query"]
 
-            # Set up string buffer to capture printed output
-            buffer = io.StringIO()
-            
-            # Prepare execution environment with access to global namespace
-            exec_globals = globals()
-            # Add local variables (like DataFrame) to execution environment
-            exec_globals.update(self._local_vars)
-            # Empty dict for local variables created during execution
-            exec_locals = {}
-
-            # Split code into body statements and final expression
-            # Body can have multiple lines, last line is treated as expression to evaluate
-            lines = command.strip().split("\n")
-            *body, last = lines if len(lines) > 1 else ("", lines[0])
-
-            # Join body lines back together
-            body_code = "\n".join(body)
-
-            # Redirect stdout to capture printed output
-            with contextlib.redirect_stdout(buffer):
-                # Execute body code if it exists
-                if body_code.strip():
-                    exec(body_code, exec_globals, exec_locals)
-                # Evaluate final expression
-                result = eval(last, exec_globals, exec_locals)
-
-            # Get any printed output from the buffer
-            printed_output = buffer.getvalue().strip()
-
-            # Combine printed output and evaluation result
-            final_output = ""
-            if printed_output:  # Add any printed statements
-                final_output += printed_output
-            if result is not None:  # Add evaluated result if not None
-                final_output += "\n" + str(result)
-
-
-            return final_output.strip()
+            # Identical read-only snippets on the same frame return their previous output
+            cache_key = self._cache_key(command)
+            if cache_key is not None and cache_key in self._result_cache:
+                self._cache_counters["hits"] += 1
+                self._result_cache.move_to_end(cache_key)
+                return self._result_cache[cache_key]
+
+            if self._sandbox is not None:
+                # Worker processes load the columns they need from the shared snapshot
+                final_output = self._sandbox.run(command)
+                if final_output.startswith("Error executing Python code"):
+                    return final_output
+            else:
+                # Pull any lazily loaded columns the code refers to before it runs
+                df = self._local_vars.get("df")
+                if hasattr(df, "load_columns_for"):
+                    df.load_columns_for(command)
+                # Module globals plus the injected frames, copied so snippets can't rebind module state
+                final_output = execute_snippet(command, {**globals(), **self._local_vars})
+
+            if cache_key is not None:
+                self._cache_counters["misses"] += 1
+                if len(final_output) <= MAX_CACHED_OUTPUT_CHARS:
+                    self._result_cache[cache_key] = final_output
+                    while len(self._result_cache) > self._cache_size:
+                        self._result_cache.popitem(last=False)
+
+            return final_output
 
         except Exception as e:
             # Return error message if code execution fails
             return f"Error executing Python code: {e}"
+
+
+# ------------------ Read-only SQL ------------------ #
+READ_ONLY_PATTERN = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+
+
+def run_readonly_query(db_path: str, query: str, params: Optional[list] = None,
+                       max_rows: int = 200, timeout_seconds: float = 5.0) -> str:
+    """
+    Run a single parameterized SELECT against a SQLite database opened read-only.
+
+    Args:
+        db_path (str): Path to the SQLite database
+        query (str): A single SELECT (or WITH ... SELECT) statement, using ? placeholders
+        params (list, optional): Values bound to the placeholders
+        max_rows (int, optional): Maximum rows returned; extra rows are reported as truncated
+        timeout_seconds (float, optional): Wall-clock limit after which the query is interrupted
+
+    Returns:
+        str: A compact pipe-separated table, or an error message
+    """
+    statement = query.strip().rstrip(";")
+    if not READ_ONLY_PATTERN.match(statement) or ";" in statement:
+        return "Error: only a single SELECT statement is allowed."
+
+    deadline = time.monotonic() + timeout_seconds
+    connection = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        connection.execute("PRAGMA query_only = ON")
+        # Returning non-zero from the progress handler aborts the running statement
+        connection.set_progress_handler(lambda: int(time.monotonic() > deadline), 10_000)
+        cursor = connection.execute(statement, params or [])
+        rows = cursor.fetchmany(max_rows + 1)
+        columns = [description[0] for description in cursor.description or []]
+    except sqlite3.OperationalError as e:
+        if "interrupted" in str(e):
+            return f"Error: query exceeded the {timeout_seconds:g}s time limit."
+        return f"Error executing SQL: {e}"
+    except sqlite3.Error as e:
+        return f"Error executing SQL: {e}"
+    finally:
+        connection.close()
+
+    truncated = len(rows) > max_rows
+    rows = rows[:max_rows]
+    lines = [" | ".join(columns)]
+    lines += [" | ".join("" if value is None else str(value) for value in row) for row in rows]
+    if truncated:
+        lines.append(f"... truncated to {max_rows} rows; add filters, aggregates or LIMIT")
+    elif not rows:
+        lines.append("(no rows)")
+    return "\n".join(lines)
+
+
+class SQLQueryInput(BaseModel):
+    query: str = Field(description="A single read-only SELECT statement over the 'yakkertech' table, "
+                                   "with ? placeholders for values")
+    params: Optional[List[Union[str, int, float]]] = Field(
+        default=None, description="Values for the ? placeholders, in order")
+
+
+class SQLQueryTool(BaseTool):
+    """
+    A read-only SQL tool that runs parameterized SELECTs directly against the SQLite database,
+    so filters and aggregations are pushed down instead of scanning the in-memory DataFrame.
+    """
+    name: str = "sql_query"
+    description: str = (
+        "Run a read-only SQL SELECT against the SQLite table 'yakkertech' (one row per pitch). "
+        "Prefer this for filtering and aggregating (e.g. GROUP BY Pitcher, WHERE GameID = ?). "
+        "Quote column names with special characters, e.g. \"Top/Bottom\". Results are capped in size."
+    )
+    args_schema: Type[BaseModel] = SQLQueryInput
+    db_path: str = "structured/sqllite_db.db"
+    max_rows: int = 200
+    timeout_seconds: float = 5.0
+
+    def _run(self, query: str, params: Optional[list] = None, run_manager=None) -> str:
+        return run_readonly_query(self.db_path, query, params, self.max_rows, self.timeout_seconds)
@@ -1,10 +1,17 @@
 import streamlit as st
-from router import route_user_prompt
+from router import PromptRouter
 
 # ---- Streamlit App ---- #
 st.set_page_config(page_title="Softball Coach Assistant", page_icon="🥎", layout="centered")
 st.title("🥎 Softball Coach Assistant")
 
+@st.cache_resource
+def get_router() -> PromptRouter:
+    """One router (agent, data, caches, sandbox workers) shared across sessions and reruns"""
+    return PromptRouter()
+
+router = get_router()
+
 # Session State to hold chat history
 if 'chat_history' not in st.session_state:
     st.session_state['chat_history'] = []
@@ -24,18 +31,38 @@ if user_input:
     # Add user message to history
     st.session_state['messages'].append({"role": "user", "content": user_input})
 
-    # Call router to get response and updated chat history
-    answer, updated_chat_history, optional_plot = route_user_prompt(user_input, st.session_state['chat_history'])
+    # Stream routing status, tool calls and answer tokens as they arrive
+    with st.chat_message("assistant"):
+        status = st.status("Thinking...", expanded=False)
+        answer_placeholder = st.empty()
+        streamed, answer, optional_plot = "", "", None
+        updated_chat_history = st.session_state['chat_history']
+
+        for event in router.stream_route(user_input, st.session_state['chat_history']):
+            if event["type"] == "status":
+                status.update(label=event["content"])
+            elif event["type"] == "tool_start":
+                status.markdown(f"🛠️ `{event['tool']}`\n```python\n{event['content']}\n```")
+                # Text streamed before a tool call is the model thinking out loud, not the answer
+                streamed = ""
+                answer_placeholder.empty()
+            elif event["type"] == "tool_end":
+                status.text(event["content"][:1000])
+            elif event["type"] == "token":
+                streamed += event["content"]
+                answer_placeholder.markdown(streamed + "▌")
+            elif event["type"] == "final":
+                answer = event["content"]
+                updated_chat_history = event["chat_history"]
+                optional_plot = event["plot"]
+
+        status.update(label="Done", state="complete")
+        answer_placeholder.markdown(answer)
+        if optional_plot:
+            st.image(optional_plot, caption="Generated Visualization", use_column_width=True)
 
     # Update session chat history
     st.session_state['chat_history'] = updated_chat_history
 
     # Add assistant response to history
     st.session_state['messages'].append({"role": "assistant", "content": answer})
-
-    # Display the assistant response
-    with st.chat_message("assistant"):
-        st.markdown(answer)
-        if optional_plot:
-            st.image(optional_plot, caption="Generated Visualization", use_column_width=True)
-